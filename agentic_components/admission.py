@@ -0,0 +1,200 @@
+"""
+Admission Control
+-----------------
+Limits how much work the API takes on at once.
+
+    run_gate        concurrent graph runs (/run_agent, batch items)
+    llm_gate        concurrent model calls across all runs
+    client_limiter  optional per-client token bucket
+
+A gate admits immediately while it has free slots. Otherwise the caller
+joins a bounded wait queue. A caller is rejected with
+`AdmissionRejected` (HTTP 429 + Retry-After) when the queue is full,
+when the estimated wait already exceeds its deadline, or when the
+deadline passes while it waits.
+
+Configure with:
+    MAX_CONCURRENT_RUNS (32), MAX_QUEUED_RUNS (64), MAX_QUEUE_WAIT (10s)
+    MAX_CONCURRENT_LLM_CALLS (16), MAX_QUEUED_LLM_CALLS (256), MAX_LLM_QUEUE_WAIT (30s)
+    CLIENT_RATE (requests/s per client, 0 = off), CLIENT_BURST (10)
+A limit of 0 disables that gate.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from agentic_components.metrics import queue_wait, record_span, registry
+
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", "32"))
+MAX_QUEUED_RUNS = int(os.getenv("MAX_QUEUED_RUNS", "64"))
+MAX_QUEUE_WAIT = float(os.getenv("MAX_QUEUE_WAIT", "10"))
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "16"))
+MAX_QUEUED_LLM_CALLS = int(os.getenv("MAX_QUEUED_LLM_CALLS", "256"))
+MAX_LLM_QUEUE_WAIT = float(os.getenv("MAX_LLM_QUEUE_WAIT", "30"))
+CLIENT_RATE = float(os.getenv("CLIENT_RATE", "0"))
+CLIENT_BURST = float(os.getenv("CLIENT_BURST", "10"))
+
+# Smoothing factor for the wait/hold time moving averages
+_EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Raised when work is shed; `retry_after` is a hint in whole seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class ConcurrencyGate:
+    """Semaphore with a bounded, deadline-aware wait queue and statistics."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_time_avg = 0.0
+        self.wait_time_max = 0.0
+        self.hold_time_avg = 0.0
+
+    def estimated_wait(self) -> float:
+        """Rough time until a new waiter would get a slot"""
+        if self._semaphore is None:
+            return 0.0
+        return self.hold_time_avg * (self.waiting + 1) / self.limit
+
+    def _reject(self, reason: str, retry_after: float):
+        self.rejected += 1
+        raise AdmissionRejected(f"{self.name}: {reason}", retry_after)
+
+    async def acquire(self, deadline: Optional[float] = None) -> float:
+        """
+        Take a slot, waiting at most until `deadline` (time.monotonic()).
+
+        Returns the time spent queued; raises AdmissionRejected.
+        """
+        start = time.monotonic()
+        if self._semaphore is not None:
+            if self._semaphore.locked():
+                budget = self.max_wait
+                if deadline is not None:
+                    budget = min(budget, deadline - start)
+                estimate = self.estimated_wait()
+                if self.waiting >= self.max_queue:
+                    self._reject("wait queue is full", estimate)
+                if budget <= 0 or estimate > budget:
+                    self._reject("estimated wait exceeds deadline", estimate)
+
+                self.waiting += 1
+                span_start = time.perf_counter()
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=budget)
+                except asyncio.TimeoutError:
+                    self._reject("deadline passed while queued", self.estimated_wait())
+                finally:
+                    self.waiting -= 1
+                    record_span(f"queue_wait:{self.name}", span_start, time.perf_counter())
+            else:
+                await self._semaphore.acquire()
+
+        waited = time.monotonic() - start
+        queue_wait.observe(waited, gate=self.name)
+        self.in_flight += 1
+        self.admitted += 1
+        self.wait_time_avg += _EWMA_ALPHA * (waited - self.wait_time_avg)
+        self.wait_time_max = max(self.wait_time_max, waited)
+        return waited
+
+    def release(self, held: Optional[float] = None):
+        """Free a slot; `held` (seconds) feeds the wait estimate, None skips it"""
+        self.in_flight -= 1
+        if held is not None:
+            self.hold_time_avg += _EWMA_ALPHA * (held - self.hold_time_avg)
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, deadline: Optional[float] = None):
+        """`async with gate.slot():` acquires and always releases"""
+        await self.acquire(deadline)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_time_avg": self.wait_time_avg,
+            "wait_time_max": self.wait_time_max,
+            "hold_time_avg": self.hold_time_avg,
+        }
+
+
+class ClientRateLimiter:
+    """Per-client token buckets (LRU-bounded); disabled when rate <= 0."""
+
+    def __init__(self, rate: float = CLIENT_RATE, burst: float = CLIENT_BURST, max_clients: int = 10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.rejected = 0
+
+    def check(self, client_id: str):
+        """Spend one token for `client_id`; raises AdmissionRejected when empty"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(client_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[client_id] = (tokens, now)
+            self.rejected += 1
+            raise AdmissionRejected("client rate limit exceeded", (1 - tokens) / self.rate)
+
+        self._buckets[client_id] = (tokens - 1, now)
+        self._buckets.move_to_end(client_id)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets), "rejected": self.rejected}
+
+
+run_gate = ConcurrencyGate("runs", MAX_CONCURRENT_RUNS, MAX_QUEUED_RUNS, MAX_QUEUE_WAIT)
+llm_gate = ConcurrencyGate("llm_calls", MAX_CONCURRENT_LLM_CALLS, MAX_QUEUED_LLM_CALLS, MAX_LLM_QUEUE_WAIT)
+client_limiter = ClientRateLimiter()
+
+
+registry.gauge(
+    "agent_admission_in_flight", "Work currently holding an admission slot", ("gate",),
+    lambda: {(gate.name,): gate.in_flight for gate in (run_gate, llm_gate)},
+)
+registry.gauge(
+    "agent_admission_queue_depth", "Callers waiting for an admission slot", ("gate",),
+    lambda: {(gate.name,): gate.waiting for gate in (run_gate, llm_gate)},
+)
+
+
+def admission_stats() -> Dict[str, Any]:
+    return {"runs": run_gate.stats(), "llm_calls": llm_gate.stats(), "clients": client_limiter.stats()}
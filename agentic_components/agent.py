@@ -1,31 +1,104 @@
-from langchain_core.messages import HumanMessage
-from agentic_components.graph import agent
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from agentic_components.budget import Budget, current_budget
+from agentic_components.graph import get_agent
+from agentic_components.threads import thread_store
 
+# What run_agent streams: node-level "agent_event"s, model "token"s, or both
+STREAM_MODES = ("nodes", "tokens", "both")
 
-async def run_agent(user_input, sse_send=None):
+
+async def run_agent(user_input, sse_send=None, fast_path=True, thread_id=None, stream="nodes", budget=None):
     """
     Run the agent with optional SSE streaming callback.
 
     Args:
         user_input: The user's message/prompt
         sse_send: Async callback function(event: str, payload: dict) for streaming events
+        fast_path: Answer bare arithmetic input without calling the LLM
+        thread_id: Continue a stored conversation; only new messages are persisted
+        stream: "nodes" (agent_event per node), "tokens" (token per model chunk) or "both"
+        budget: Limits for this run (agentic_components.budget.Budget); defaults from env
 
     Returns:
         The final AI message response
     """
-    messages = [HumanMessage(content=user_input)]
+    # Graph nodes charge and check this run's budget through the context variable
+    token = current_budget.set(budget if budget is not None else Budget())
+    try:
+        if thread_id is None:
+            return await _run(user_input, sse_send, fast_path, stream, history=[])
+
+        # Serialize runs on the same thread so their deltas don't interleave
+        async with thread_store.lock(thread_id):
+            history = await thread_store.load(thread_id)
+            return await _run(user_input, sse_send, fast_path, stream, history, thread_id)
+    finally:
+        current_budget.reset(token)
+
+
+def _token_payload(chunk, metadata: dict, partials: dict):
+    """
+    Build a `token` event from a LangGraph `messages` stream item.
+
+    Chunks of one message are accumulated in `partials`, so each event
+    carries the tool calls parsed so far rather than raw JSON fragments.
+    Returns None for non-AI messages (tool results arrive as node events).
+    """
+    if not isinstance(chunk, AIMessage):
+        return None
+
+    payload = {"node": metadata.get("langgraph_node"), "id": chunk.id, "content": chunk.content}
+    if isinstance(chunk, AIMessageChunk):
+        merged = partials.get(chunk.id)
+        merged = chunk if merged is None else merged + chunk
+        partials[chunk.id] = merged
+        if chunk.tool_call_chunks:
+            payload["tool_calls"] = merged.tool_calls
+        elif not chunk.content:
+            # Empty keep-alive/terminal chunk: nothing to forward
+            return None
+    else:
+        # Whole message (cache hit, fast path or a non-streaming model)
+        payload["tool_calls"] = chunk.tool_calls
+        payload["final"] = True
+    return payload
+
+
+async def _run(user_input, sse_send, fast_path, stream, history, thread_id=None):
+    human_message = HumanMessage(content=user_input)
+    messages = history + [human_message]
+    inputs = {"messages": messages, "fast_path": fast_path}
+    new_messages = [human_message]
 
     # Stream events from the agent if callback provided
     if sse_send:
         await sse_send("thinking", {"content": f"Processing: {user_input}"})
 
+    agent = get_agent()
+
     # Invoke agent with streaming if available
-    if sse_send and hasattr(agent, 'stream'):
-        # Use streaming if available
+    if sse_send and hasattr(agent, 'astream'):
+        # Use async streaming so slow model/tool calls don't block the event loop
         final_state = None
-        for event in agent.stream({"messages": messages}):
-            if sse_send:
+        stream_modes = ["updates", "messages"] if stream in ("tokens", "both") else ["updates"]
+        partials = {}
+        async for mode, event in agent.astream(inputs, stream_mode=stream_modes):
+            if mode == "messages":
+                payload = _token_payload(*event, partials)
+                if payload is not None:
+                    await sse_send("token", payload)
+                continue
+
+            if stream != "tokens":
                 await sse_send("agent_event", event)
+            if "budget_exhausted" in event:
+                await sse_send("meta", {
+                    "budget_exhausted": event["budget_exhausted"]["budget_exhausted"],
+                    "budget": current_budget.get().to_dict(),
+                })
+            for update in event.values():
+                if isinstance(update, dict):
+                    new_messages.extend(update.get("messages", []))
             final_state = event
 
         # Extract the final response - event structure is {key: {messages: [...]}}
@@ -41,7 +114,11 @@ async def run_agent(user_input, sse_send=None):
             response = {}
     else:
         # Fallback to regular invoke
-        response = agent.invoke({"messages": messages})
+        response = await agent.ainvoke(inputs)
+        new_messages = response["messages"][len(history):]
+
+    if thread_id is not None:
+        await thread_store.append(thread_id, new_messages)
 
     if sse_send:
         await sse_send("thinking", {"content": "Agent processing complete"})
@@ -0,0 +1,137 @@
+"""
+Execution Budgets
+-----------------
+Per-request limits on model calls, tokens, tool calls and wall time.
+
+A `Budget` is installed for each run (see `run_agent`) in the `current_budget`
+context variable, which the graph nodes read. Nodes charge it as they go.
+`should_continue`/`after_tools` send the run to the `budget_exhausted` node
+once any limit is reached, and that node ends the run with a best-effort
+answer. The remaining wall time also caps the model, tool and MCP HTTP
+timeouts (see `budget_timeout`).
+
+Defaults come from the environment and are also the ceilings: a request can
+tighten a limit but not raise it. 0 means unlimited.
+    BUDGET_MAX_LLM_CALLS (10), BUDGET_MAX_TOKENS (0), BUDGET_MAX_TOOL_CALLS (50),
+    BUDGET_MAX_SECONDS (120)
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+BUDGET_MAX_LLM_CALLS = int(os.getenv("BUDGET_MAX_LLM_CALLS", "10"))
+BUDGET_MAX_TOKENS = int(os.getenv("BUDGET_MAX_TOKENS", "0"))
+BUDGET_MAX_TOOL_CALLS = int(os.getenv("BUDGET_MAX_TOOL_CALLS", "50"))
+BUDGET_MAX_SECONDS = float(os.getenv("BUDGET_MAX_SECONDS", "120"))
+
+# Request body fields of the `budget` object, and their defaults/ceilings
+_LIMITS = {
+    "max_llm_calls": BUDGET_MAX_LLM_CALLS,
+    "max_tokens": BUDGET_MAX_TOKENS,
+    "max_tool_calls": BUDGET_MAX_TOOL_CALLS,
+    "max_seconds": BUDGET_MAX_SECONDS,
+}
+
+
+def _tighten(requested: Any, ceiling: float) -> float:
+    """Client value, bounded by the server's ceiling (0 = unlimited on either side)"""
+    if requested is None:
+        return ceiling
+    requested = float(requested)
+    if requested < 0:
+        raise ValueError("budget values must be >= 0")
+    if not requested:
+        return ceiling
+    return min(requested, ceiling) if ceiling else requested
+
+
+class Budget:
+    """Limits and usage of one agent run."""
+
+    def __init__(
+        self,
+        max_llm_calls: int = BUDGET_MAX_LLM_CALLS,
+        max_tokens: int = BUDGET_MAX_TOKENS,
+        max_tool_calls: int = BUDGET_MAX_TOOL_CALLS,
+        max_seconds: float = BUDGET_MAX_SECONDS,
+    ):
+        self.max_llm_calls = int(max_llm_calls)
+        self.max_tokens = int(max_tokens)
+        self.max_tool_calls = int(max_tool_calls)
+        self.max_seconds = float(max_seconds)
+        self.started = time.monotonic()
+        self.deadline = self.started + self.max_seconds if self.max_seconds else None
+
+        self.llm_calls = 0
+        self.tokens = 0
+        self.tool_calls = 0
+
+    @classmethod
+    def from_request(cls, options: Optional[Dict[str, Any]]) -> "Budget":
+        """Budget from a request's `budget` object; raises ValueError on bad input"""
+        options = options or {}
+        if not isinstance(options, dict):
+            raise ValueError("'budget' must be an object")
+        unknown = set(options) - set(_LIMITS)
+        if unknown:
+            raise ValueError(f"Unknown budget fields: {sorted(unknown)}")
+        return cls(**{name: _tighten(options.get(name), ceiling) for name, ceiling in _LIMITS.items()})
+
+    def charge_llm(self, tokens: int = 0):
+        self.llm_calls += 1
+        self.tokens += tokens
+
+    def charge_tools(self, count: int):
+        self.tool_calls += count
+
+    def remaining_time(self) -> Optional[float]:
+        """Seconds until the deadline (never negative), or None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def exhausted(self, pending_tool_calls: int = 0) -> Optional[str]:
+        """Name of the first budget that is used up (counting tool calls about to run), else None"""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "deadline"
+        if self.max_llm_calls and self.llm_calls >= self.max_llm_calls:
+            return "llm_calls"
+        if self.max_tokens and self.tokens >= self.max_tokens:
+            return "tokens"
+        if self.max_tool_calls and self.tool_calls + pending_tool_calls > self.max_tool_calls:
+            return "tool_calls"
+        return None
+
+    def allows_tools(self, pending_tool_calls: int) -> bool:
+        """Whether tool calls about to run fit in the time and tool call budgets"""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return False
+        return not (self.max_tool_calls and self.tool_calls + pending_tool_calls > self.max_tool_calls)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.llm_calls,
+            "max_llm_calls": self.max_llm_calls,
+            "tokens": self.tokens,
+            "max_tokens": self.max_tokens,
+            "tool_calls": self.tool_calls,
+            "max_tool_calls": self.max_tool_calls,
+            "elapsed": round(time.monotonic() - self.started, 3),
+            "max_seconds": self.max_seconds,
+        }
+
+
+current_budget: ContextVar[Optional[Budget]] = ContextVar("current_budget", default=None)
+
+
+def budget_timeout(default: Optional[float]) -> Optional[float]:
+    """`default` timeout, shortened to the current run's remaining wall time"""
+    budget = current_budget.get()
+    remaining = budget.remaining_time() if budget is not None else None
+    if remaining is None:
+        return default
+    # Keep a sliver so an already expired budget still yields a (fast) timeout, not "no timeout"
+    remaining = max(remaining, 0.001)
+    return remaining if default is None else min(default, remaining)
@@ -0,0 +1,187 @@
+"""
+Request Coalescing
+------------------
+Single-flight execution of identical in-flight requests.
+
+The first request for a key starts the run; identical requests that
+arrive while it is running subscribe to it instead of starting their
+own. Events are encoded once and appended to a shared replay buffer;
+each subscriber only keeps a cursor into it, so fan-out costs one buffer
+entry per event regardless of the number of subscribers, and late
+joiners replay everything they missed. The run is cancelled when its
+last subscriber disconnects.
+
+The buffer is bounded like a single stream's queue (SSE_QUEUE_SIZE and
+SSE_OVERFLOW_POLICY in api.py): with "block" the run waits while a
+subscriber is a full queue behind; with the drop policies the buffer
+keeps only the newest chunks and a reader that falls behind it skips
+ahead (": skipped N events").
+
+Configure with:
+    COALESCE_ENABLED        (default true)
+    COALESCE_REPLAY_LIMIT   events buffered before a run stops accepting joiners (default 1024)
+"""
+
+import asyncio
+import os
+import re
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from agentic_components.cache import stable_hash
+
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+COALESCE_REPLAY_LIMIT = int(os.getenv("COALESCE_REPLAY_LIMIT", "1024"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class SharedRun:
+    """One running request whose encoded SSE chunks are shared by all subscribers."""
+
+    def __init__(
+        self,
+        key: str,
+        encode: Callable[[str, Any], str],
+        on_finish: Callable[["SharedRun"], None],
+        replay_limit: int = COALESCE_REPLAY_LIMIT,
+        queue_size: int = 256,
+        policy: str = "block",
+    ):
+        if policy not in ("block", "drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown SSE overflow policy: {policy}")
+        self.key = key
+        self.encode = encode
+        self.queue_size = queue_size
+        self.policy = policy
+        # Room for a joiner's full replay, and for the final chunk on top of a full queue
+        self.chunks: deque = deque(maxlen=max(replay_limit, queue_size) + 1)
+        self.published = 0              # chunks ever published; chunks[0] is number published - len(chunks)
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        # RunLog (event_log.py) of the run when streams are resumable; it then owns cancellation
+        self.log = None
+        self._cursors: Dict[object, int] = {}
+        self._changed = asyncio.Event()
+        self._consumed = asyncio.Event()
+        self._on_finish = on_finish
+
+    @property
+    def first(self) -> int:
+        """Number of the oldest chunk still buffered"""
+        return self.published - len(self.chunks)
+
+    def publish(self, chunk: str):
+        self.chunks.append(chunk)
+        self.published += 1
+        # Wake current waiters; later waits use a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _lagging(self) -> bool:
+        return bool(self._cursors) and self.published - min(self._cursors.values()) >= self.queue_size
+
+    async def send(self, event: str, payload: dict):
+        """sse_send-compatible callback for run_agent"""
+        if self.policy == "block":
+            # Backpressure: wait for the slowest subscriber, as a full SSEStream would
+            while self._lagging():
+                await self._consumed.wait()
+        # Encode only now, so chunks are published in the order they were encoded
+        self.publish(self.encode(event, payload))
+
+    def _advance(self, token: object, cursor: Optional[int]):
+        if cursor is None:
+            self._cursors.pop(token, None)
+        else:
+            self._cursors[token] = cursor
+        self._consumed.set()
+        self._consumed = asyncio.Event()
+
+    def finish(self, final_chunk: Optional[str] = None):
+        """Publish the last chunk and stop accepting subscribers (idempotent)"""
+        if self.done:
+            return
+        if final_chunk is not None:
+            self.publish(final_chunk)
+        self.done = True
+        self._changed.set()
+        self._on_finish(self)
+
+    async def subscribe(self, heartbeat: str, heartbeat_interval: float):
+        """Yield every buffered chunk from the beginning, then follow the run live."""
+        self.subscribers += 1
+        token = object()
+        cursor = 0
+        self._advance(token, cursor)
+        try:
+            while True:
+                while cursor < self.published:
+                    if cursor < self.first:
+                        # Fell further behind than the buffer holds (drop policies, or a joiner that started late)
+                        yield f": skipped {self.first - cursor} events\n\n"
+                        cursor = self.first
+                        continue
+                    # Index, not iterate: the buffer may change while we are suspended in yield
+                    yield self.chunks[cursor - self.first]
+                    cursor += 1
+                    self._advance(token, cursor)
+                if self.done:
+                    return
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield heartbeat
+        finally:
+            self._advance(token, None)
+            self.subscribers -= 1
+            if self.subscribers == 0 and self.task is not None and not self.task.done():
+                # Nobody is listening any more: stop spending LLM calls
+                self.task.cancel()
+
+
+class RunCoalescer:
+    """Registry of joinable in-flight runs, keyed by normalized request."""
+
+    def __init__(self, enabled: bool = COALESCE_ENABLED, replay_limit: int = COALESCE_REPLAY_LIMIT):
+        self.enabled = enabled
+        self.replay_limit = replay_limit
+        self._runs: Dict[str, SharedRun] = {}
+        self.joined = 0
+
+    @staticmethod
+    def key(message: str, options: Dict[str, Any]) -> str:
+        normalized = _WHITESPACE_RE.sub(" ", message.strip())
+        return stable_hash({"message": normalized, "options": options})
+
+    def join(self, key: str) -> Optional[SharedRun]:
+        """Return a running run for `key` that can still take subscribers"""
+        run = self._runs.get(key)
+        if run is None or run.done:
+            return None
+        if run.published > self.replay_limit:
+            # Replay buffer too long for a late joiner; let new callers start fresh
+            self._runs.pop(key, None)
+            return None
+        self.joined += 1
+        return run
+
+    def start(
+        self, key: str, encode: Callable[[str, Any], str], queue_size: int = 256, policy: str = "block"
+    ) -> SharedRun:
+        """New joinable run; `queue_size` and `policy` bound its buffer like an SSEStream's"""
+        run = SharedRun(key, encode, self._finished, self.replay_limit, queue_size, policy)
+        self._runs[key] = run
+        return run
+
+    def _finished(self, run: SharedRun):
+        if self._runs.get(run.key) is run:
+            del self._runs[run.key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "in_flight": len(self._runs), "joined": self.joined}
+
+
+coalescer = RunCoalescer()
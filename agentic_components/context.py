@@ -0,0 +1,207 @@
+"""
+Context Compaction
+------------------
+Shrinks the prompt sent to the model on each `llm_call` iteration; the graph
+state itself keeps the full history.
+
+1. Tool rounds (an AI message with tool_calls plus its tool results) older
+   than the latest CONTEXT_KEEP_TOOL_ROUNDS are collapsed into one short AI
+   note ("calculate({"expression": "2+3"}) -> 5"), so no tool_call_id is
+   left without its partner.
+2. If the prompt is still over CONTEXT_MAX_TOKENS, the oldest messages are
+   dropped, one whole unit at a time. The system prompt, the latest human
+   message and the recent tool rounds are never dropped.
+
+Token counts use tiktoken when it is installed (else ~4 characters per
+token) and are cached per message object, so each message is counted once
+across the iterations of a run.
+"""
+
+import json
+import os
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from agentic_components.metrics import registry
+
+CONTEXT_COMPACTION_ENABLED = os.getenv("CONTEXT_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Prompt token budget (system prompt included); 0 disables dropping
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "16000"))
+# Most recent tool rounds sent verbatim; older ones are collapsed into notes
+CONTEXT_KEEP_TOOL_ROUNDS = int(os.getenv("CONTEXT_KEEP_TOOL_ROUNDS", "2"))
+# Characters of each tool result kept in a collapsed note
+CONTEXT_SUMMARY_RESULT_CHARS = int(os.getenv("CONTEXT_SUMMARY_RESULT_CHARS", "200"))
+# tiktoken encoding used for counting, when tiktoken is installed
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "o200k_base")
+
+# Fixed per-message overhead of the chat format (role, separators)
+_MESSAGE_OVERHEAD = 4
+
+prompt_tokens = registry.histogram(
+    "agent_prompt_tokens", "Estimated prompt tokens per model call after compaction", (),
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+compacted_messages = registry.counter(
+    "agent_context_compacted_messages_total", "Messages collapsed or dropped from model prompts", ("action",)
+)
+
+
+class _MessageMemo:
+    """Values cached per message object (messages are unhashable); entries go away with the message."""
+
+    def __init__(self):
+        self._data: Dict[int, Tuple[weakref.ref, Any]] = {}
+
+    def get(self, message: BaseMessage, compute: Callable[[BaseMessage], Any]) -> Any:
+        key = id(message)
+        entry = self._data.get(key)
+        if entry is not None and entry[0]() is message:
+            return entry[1]
+        value = compute(message)
+        self._data[key] = (weakref.ref(message, lambda _, key=key: self._data.pop(key, None)), value)
+        return value
+
+
+_encoding = None
+_token_counts = _MessageMemo()
+_round_notes = _MessageMemo()
+_system_messages: Dict[str, SystemMessage] = {}
+
+
+def _encode_len(text: str) -> int:
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(CONTEXT_TOKENIZER)
+        except Exception:  # not installed, or the encoding can't be loaded offline
+            _encoding = False
+    if _encoding is False:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        content += json.dumps([{"name": c["name"], "args": c["args"]} for c in tool_calls], default=str)
+    return content
+
+
+def count_tokens(message: BaseMessage) -> int:
+    """Estimated tokens of one message (cached per message object)"""
+    return _token_counts.get(message, lambda m: _encode_len(_message_text(m)) + _MESSAGE_OVERHEAD)
+
+
+def count_prompt_tokens(messages: List[BaseMessage]) -> int:
+    return sum(count_tokens(m) for m in messages)
+
+
+def _split_units(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into droppable units: a tool round stays together, anything else stands alone"""
+    units: List[List[BaseMessage]] = []
+    i = 0
+    while i < len(messages):
+        message = messages[i]
+        if isinstance(message, AIMessage) and message.tool_calls:
+            ids = {call["id"] for call in message.tool_calls}
+            j = i + 1
+            while j < len(messages) and isinstance(messages[j], ToolMessage) and messages[j].tool_call_id in ids:
+                j += 1
+            units.append(messages[i:j])
+            i = j
+        else:
+            units.append([message])
+            i += 1
+    return units
+
+
+def _is_round(unit: List[BaseMessage]) -> bool:
+    return isinstance(unit[0], AIMessage) and bool(unit[0].tool_calls)
+
+
+def _collapse_round(unit: List[BaseMessage]) -> AIMessage:
+    """One AI note standing in for a finished tool round"""
+    def build(ai_message: AIMessage) -> AIMessage:
+        results = {m.tool_call_id: str(m.content) for m in unit[1:]}
+        limit = CONTEXT_SUMMARY_RESULT_CHARS
+        lines = []
+        for call in ai_message.tool_calls:
+            result = results.get(call["id"], "(no result)")
+            if len(result) > limit:
+                result = result[:limit] + "..."
+            lines.append(f"{call['name']}({json.dumps(call['args'], default=str)}) -> {result}")
+        text = "Earlier tool calls:\n" + "\n".join(lines)
+        if ai_message.content:
+            text = f"{ai_message.content}\n{text}"
+        return AIMessage(content=text)
+
+    # A round is complete once later messages exist, so its note never changes
+    return _round_notes.get(unit[0], build)
+
+
+def compact_messages(
+    messages: List[BaseMessage],
+    max_tokens: int = CONTEXT_MAX_TOKENS,
+    keep_tool_rounds: int = CONTEXT_KEEP_TOOL_ROUNDS,
+) -> List[BaseMessage]:
+    """
+    Prompt to send for `messages` (system prompt first, if any).
+    Returns the input list unchanged when there is nothing to compact.
+    """
+    if not CONTEXT_COMPACTION_ENABLED:
+        return messages
+
+    units = _split_units(messages)
+    round_positions = [i for i, unit in enumerate(units) if _is_round(unit)]
+    recent = set(round_positions[-keep_tool_rounds:]) if keep_tool_rounds > 0 else set()
+    tail_start = min(recent) if recent else len(units)
+
+    # 1. Collapse older tool rounds
+    collapsed = 0
+    for i in round_positions:
+        if i not in recent:
+            collapsed += len(units[i])
+            units[i] = [_collapse_round(units[i])]
+
+    # 2. Drop the oldest unpinned units until the prompt fits the budget
+    last_human = max((i for i, u in enumerate(units) if isinstance(u[0], HumanMessage)), default=None)
+    pinned = {i for i, u in enumerate(units) if isinstance(u[0], SystemMessage)}
+    pinned |= {i for i in range(tail_start, len(units))}
+    if last_human is not None:
+        pinned.add(last_human)
+
+    dropped = 0
+    if max_tokens > 0:
+        total = sum(count_tokens(m) for unit in units for m in unit)
+        for i in range(len(units)):
+            if total <= max_tokens:
+                break
+            if i in pinned:
+                continue
+            total -= sum(count_tokens(m) for m in units[i])
+            dropped += len(units[i])
+            units[i] = []
+
+    if collapsed:
+        compacted_messages.inc(collapsed, action="collapsed")
+    if dropped:
+        compacted_messages.inc(dropped, action="dropped")
+    if not collapsed and not dropped:
+        return messages
+    return [m for unit in units for m in unit]
+
+
+def prepare_prompt(system_prompt: str, messages: List[BaseMessage], max_tokens: Optional[int] = None) -> List[BaseMessage]:
+    """System prompt + compacted history; records the prompt size"""
+    system_message = _system_messages.get(system_prompt)
+    if system_message is None:
+        # One object per prompt text, so its token count is cached too
+        system_message = _system_messages[system_prompt] = SystemMessage(content=system_prompt)
+    prompt = [system_message] + list(messages)
+    prompt = compact_messages(prompt, CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens)
+    prompt_tokens.observe(count_prompt_tokens(prompt))
+    return prompt
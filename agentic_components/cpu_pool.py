@@ -0,0 +1,319 @@
+"""
+CPU Pool
+--------
+Runs CPU-bound tool work in warm worker processes, so a heavy call cannot
+stall the MCP server's event loop (and every other tool call with it).
+
+    from agentic_components.cpu_pool import cpu_pool
+    result = await cpu_pool.run(_safe_eval_expr, expression)
+
+`func` must be picklable, i.e. a module-level function. Offloading is
+explicit: a tool is async and awaits `cpu_pool.run` for its heavy part;
+tools that don't call it keep running inline, untouched by the pool.
+
+Workers are started once and reused. Each job gets:
+    - a CPU-time cap: RLIMIT_CPU, re-armed before every job
+    - a memory cap: RLIMIT_AS, as headroom above the worker's size at startup
+    - a wall-clock timeout, enforced by the server process
+A worker that overruns any of them (or dies) is killed and replaced.
+Jobs wait for a free worker in a bounded queue; its depth is exported on
+/metrics as `mcp_cpu_pool_queue_depth` once the pool has started.
+
+Configure with:
+    CPU_POOL_WORKERS (2; 0 = run jobs inline), CPU_POOL_MAX_QUEUE (64)
+    CPU_JOB_TIMEOUT (5s), CPU_JOB_CPU_SECONDS (2), CPU_JOB_MEMORY_MB (256)
+    CPU_POOL_START_METHOD (spawn)
+The CPU and memory caps need the POSIX `resource` module; elsewhere only
+the timeout applies. 0 disables a limit.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from agentic_components.metrics import registry
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "2"))
+CPU_POOL_MAX_QUEUE = int(os.getenv("CPU_POOL_MAX_QUEUE", "64"))
+CPU_JOB_TIMEOUT = float(os.getenv("CPU_JOB_TIMEOUT", "5"))
+CPU_JOB_CPU_SECONDS = int(os.getenv("CPU_JOB_CPU_SECONDS", "2"))
+CPU_JOB_MEMORY_MB = int(os.getenv("CPU_JOB_MEMORY_MB", "256"))
+# "spawn" keeps workers independent of the server's threads; "fork"/"forkserver" also work on POSIX
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "spawn")
+
+class CPUPoolError(Exception):
+    """A pool job did not produce a result: the queue was full, a limit was hit, or the function raised."""
+
+
+# ---------- Worker process ----------
+
+class _CPULimitExceeded(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CPULimitExceeded()
+
+
+def _address_space() -> int:
+    """Current virtual memory size in bytes (Linux), else 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _set_cpu_limit(seconds: Optional[float]):
+    """Soft RLIMIT_CPU `seconds` from now (None: lift it); the hard limit is left alone"""
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = hard if seconds is None else math.ceil(_cpu_time() + seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(conn, cpu_seconds: int, memory_bytes: int):
+    # Ctrl+C is meant for the server; it takes the (daemon) workers down with it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    limit_cpu = resource is not None and cpu_seconds > 0
+    if resource is not None and memory_bytes > 0:
+        limit = _address_space() + memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if limit_cpu:
+        # The kernel sends SIGXCPU at the soft limit; turn it into an exception inside the job
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+    while True:
+        try:
+            func, args = conn.recv()
+        except (EOFError, OSError):
+            return  # server went away
+        except Exception as e:
+            conn.send(("error", f"Could not load job: {e}"))
+            continue
+
+        try:
+            if limit_cpu:
+                _set_cpu_limit(cpu_seconds)
+            try:
+                result = func(*args)
+            finally:
+                if limit_cpu:
+                    _set_cpu_limit(None)
+            reply = ("ok", result)
+        except _CPULimitExceeded:
+            reply = ("cpu_limit", f"exceeded the {cpu_seconds}s CPU limit")
+        except MemoryError:
+            reply = ("memory_limit", f"exceeded the {memory_bytes // (1024 * 1024)}MB memory limit")
+        except Exception as e:
+            reply = ("error", str(e))
+
+        try:
+            conn.send(reply)
+        except Exception as e:  # unpicklable result
+            conn.send(("error", f"Could not return result: {e}"))
+
+
+# ---------- Pool ----------
+
+class _Worker:
+    def __init__(self, ctx, cpu_seconds: int, memory_bytes: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, cpu_seconds, memory_bytes), name="cpu-pool-worker", daemon=True
+        )
+        self.process.start()
+        # Only the child holds its end, so the parent sees EOF when the worker dies
+        child_conn.close()
+
+    def kill(self):
+        """Kill the process without waiting for it to exit; join() reaps it"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+    def join(self):
+        self.process.join(timeout=1)
+
+
+class CPUPool:
+    """Fixed set of worker processes with a bounded wait queue."""
+
+    def __init__(
+        self,
+        workers: int = CPU_POOL_WORKERS,
+        max_queue: int = CPU_POOL_MAX_QUEUE,
+        timeout: float = CPU_JOB_TIMEOUT,
+        cpu_seconds: int = CPU_JOB_CPU_SECONDS,
+        memory_mb: int = CPU_JOB_MEMORY_MB,
+        start_method: str = CPU_POOL_START_METHOD,
+    ):
+        self.size = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.start_method = start_method
+
+        self._ctx = None
+        self._workers: List[_Worker] = []
+        self._idle: List[_Worker] = []
+        self._waiters: deque = deque()
+        self.busy = 0
+        self._jobs = None
+        self._latency = None
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    def start(self):
+        """Start the workers now rather than on the first job"""
+        if self._ctx is None:
+            self._ctx = multiprocessing.get_context(self.start_method)
+            self._register_metrics()
+        while len(self._workers) < self.size:
+            self._release(self._spawn())
+
+    def _register_metrics(self):
+        # Only processes that start the pool (the MCP server) export these
+        self._jobs = registry.counter("mcp_cpu_pool_jobs_total", "CPU pool jobs by outcome", ("status",))
+        self._latency = registry.histogram("mcp_cpu_pool_job_seconds", "Time CPU pool jobs spent in a worker", ())
+        registry.gauge(
+            "mcp_cpu_pool_queue_depth", "Jobs waiting for a free CPU pool worker", (),
+            lambda: {(): self.waiting},
+        )
+        registry.gauge(
+            "mcp_cpu_pool_busy_workers", "CPU pool workers running a job", (),
+            lambda: {(): self.busy},
+        )
+        registry.gauge(
+            "mcp_cpu_pool_workers", "CPU pool worker processes", (),
+            lambda: {(): self.workers},
+        )
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.kill()
+        for worker in self._workers:
+            worker.join()
+        self._workers.clear()
+        self._idle.clear()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.cpu_seconds, self.memory_bytes)
+        self._workers.append(worker)
+        return worker
+
+    def _release(self, worker: _Worker):
+        """Hand a free worker to the oldest waiter, or park it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(worker)
+                return
+        self._idle.append(worker)
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        # Reap it off the event loop: the kill takes effect asynchronously
+        asyncio.get_running_loop().run_in_executor(None, worker.join)
+        self._workers.remove(worker)
+        self._release(self._spawn())
+
+    async def _acquire(self) -> _Worker:
+        self.start()
+        if self._idle:
+            return self._idle.pop()
+        if len(self._waiters) >= self.max_queue:
+            raise CPUPoolError("CPU pool queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            # Cancelled just after being handed a worker: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self._release(waiter.result())
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    @staticmethod
+    async def _receive(worker: _Worker):
+        loop = asyncio.get_running_loop()
+        if sys.platform == "win32":
+            # Pipe handles can't be watched by the selector loop there
+            await loop.run_in_executor(None, worker.conn.poll, None)
+            return worker.conn.recv()
+
+        ready = loop.create_future()
+        fd = worker.conn.fileno()
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(fd)
+        return worker.conn.recv()
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """`func(*args)` in a worker; raises CPUPoolError if it fails or overruns"""
+        if self.size <= 0:
+            return func(*args)
+
+        timeout = self.timeout if timeout is None else timeout
+        worker = await self._acquire()
+        self.busy += 1
+        start = time.perf_counter()
+        status = "error"
+        try:
+            try:
+                worker.conn.send((func, args))
+                status, value = await asyncio.wait_for(self._receive(worker), timeout or None)
+            except asyncio.TimeoutError:
+                status = "timeout"
+                raise CPUPoolError(f"exceeded the {timeout:g}s time limit") from None
+            except (EOFError, OSError):
+                status = "crashed"
+                raise CPUPoolError("worker process died") from None
+            except asyncio.CancelledError:
+                # The worker may still be busy with the job: don't hand it to anyone else
+                status = "cancelled"
+                raise
+            if status != "ok":
+                raise CPUPoolError(value)
+            return value
+        finally:
+            self.busy -= 1
+            self._jobs.inc(status=status)
+            self._latency.observe(time.perf_counter() - start)
+            if status in ("ok", "error"):
+                self._release(worker)
+            else:
+                self._replace(worker)
+
+
+cpu_pool = CPUPool()
@@ -0,0 +1,410 @@
+"""
+Run Event Log
+-------------
+Makes SSE streams resumable. Every run gets an ID, and each of its events
+is encoded once, numbered and appended to a bounded per-run log. The SSE
+response reads from that log, so the `id:` of an event is
+"<run_id>:<seq>", and a client that lost its connection can send the last
+id it saw as `Last-Event-ID`. It then gets the missed events and follows
+the run live, without the graph being run again.
+
+A run keeps going for SSE_RESUME_GRACE seconds after its last reader has
+disconnected, and is cancelled if nobody reconnects in that time.
+
+Live readers are bounded like a single stream's queue (SSE_QUEUE_SIZE and
+SSE_OVERFLOW_POLICY in api.py): with "block" the run waits while the
+slowest reader is a full queue behind; with the drop policies it never
+waits, and a reader that falls behind the log skips ahead
+(": skipped N events").
+
+Backends:
+    - EventLog: logs of this process, kept for EVENT_LOG_TTL after their last event
+    - SQLiteEventLog: additionally written to a SQLite file, so other workers
+      on the host can replay (and poll) runs they are not running themselves
+
+Configure with:
+    SSE_RESUME_ENABLED       (default true)
+    EVENT_LOG                "memory" (default) or "sqlite"
+    EVENT_LOG_DB             SQLite path (default "events.sqlite")
+    EVENT_LOG_TTL            seconds a run stays resumable after its last event (default 600)
+    EVENT_LOG_MAX_RUNS       runs kept in memory (default 1000)
+    EVENT_LOG_MAX_EVENTS     events kept per run; older ones can't be replayed (default 1024)
+    SSE_RESUME_GRACE         seconds a run survives without readers (default 30)
+    EVENT_LOG_POLL_INTERVAL  how often another worker's SQLite log is polled (default 0.25s)
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from agentic_components.metrics import registry
+from agentic_components.sse import format_sse
+
+SSE_RESUME_ENABLED = os.getenv("SSE_RESUME_ENABLED", "true").lower() in ("1", "true", "yes")
+EVENT_LOG = os.getenv("EVENT_LOG", "memory").lower()
+EVENT_LOG_DB = os.getenv("EVENT_LOG_DB", "events.sqlite")
+EVENT_LOG_TTL = float(os.getenv("EVENT_LOG_TTL", "600"))
+EVENT_LOG_MAX_RUNS = int(os.getenv("EVENT_LOG_MAX_RUNS", "1000"))
+EVENT_LOG_MAX_EVENTS = int(os.getenv("EVENT_LOG_MAX_EVENTS", "1024"))
+SSE_RESUME_GRACE = float(os.getenv("SSE_RESUME_GRACE", "30"))
+EVENT_LOG_POLL_INTERVAL = float(os.getenv("EVENT_LOG_POLL_INTERVAL", "0.25"))
+
+sse_resumes = registry.counter(
+    "agent_sse_resumes_total", "Reconnects with Last-Event-ID by outcome", ("status",)
+)
+
+
+class EventsExpired(Exception):
+    """The events after the requested id are no longer in the log."""
+
+
+def parse_event_id(value: str) -> Tuple[Optional[str], int]:
+    """("<run_id>:<seq>" | "<seq>") -> (run_id or None, seq); raises ValueError"""
+    run_id, _, seq = value.strip().rpartition(":")
+    return run_id or None, int(seq)
+
+
+class RunLog:
+    """Numbered, encoded SSE events of one run, followed live by any number of readers."""
+
+    def __init__(
+        self,
+        run_id: str,
+        encode: Callable[..., str],
+        max_events: int = EVENT_LOG_MAX_EVENTS,
+        grace: float = SSE_RESUME_GRACE,
+        on_record: Optional[Callable[["RunLog", int, str], None]] = None,
+        on_finish: Optional[Callable[["RunLog"], None]] = None,
+        queue_size: int = 256,
+        policy: str = "block",
+    ):
+        if policy not in ("block", "drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown SSE overflow policy: {policy}")
+        self.run_id = run_id
+        self.encode = encode            # e.g. format_sse(event, payload, event_id)
+        self.events: deque = deque(maxlen=max_events)   # (seq, chunk)
+        self.last_seq = 0
+        self.done = False
+        self.updated = time.monotonic()
+        self.grace = grace
+        self.task: Optional[asyncio.Task] = None
+        self.readers = 0
+        self.queue_size = queue_size
+        self.policy = policy
+        self._cursors: Dict[object, int] = {}     # live reader -> last seq it was sent
+        self._cancel_timer: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Event()
+        self._consumed = asyncio.Event()
+        self._on_record = on_record
+        self._on_finish = on_finish
+
+    @property
+    def first_seq(self) -> int:
+        return self.events[0][0] if self.events else self.last_seq + 1
+
+    def record(self, event: str, payload: Any) -> str:
+        """Encode and append one event; returns its SSE text"""
+        self.last_seq += 1
+        chunk = self.encode(event, payload, f"{self.run_id}:{self.last_seq}")
+        self.events.append((self.last_seq, chunk))
+        self.updated = time.monotonic()
+        if self._on_record is not None:
+            self._on_record(self, self.last_seq, chunk)
+        # Wake current readers; later waits use a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+        return chunk
+
+    def _lagging(self) -> bool:
+        return bool(self._cursors) and self.last_seq - min(self._cursors.values()) >= self.queue_size
+
+    async def send(self, event: str, payload: dict):
+        """sse_send-compatible callback for run_agent"""
+        if self.policy == "block":
+            # Backpressure: wait for the slowest live reader, as a full SSEStream would
+            while self._lagging():
+                await self._consumed.wait()
+        self.record(event, payload)
+
+    def _advance(self, token: object, cursor: Optional[int]):
+        if cursor is None:
+            self._cursors.pop(token, None)
+        else:
+            self._cursors[token] = cursor
+        self._consumed.set()
+        self._consumed = asyncio.Event()
+
+    def finish(self, event: str, payload: Any) -> Optional[str]:
+        """Record the final event and mark the run done (idempotent)"""
+        if self.done:
+            return None
+        chunk = self.record(event, payload)
+        self.done = True
+        self.task = None
+        if self._cancel_timer is not None:
+            self._cancel_timer.cancel()
+        if self._on_finish is not None:
+            self._on_finish(self)
+        return chunk
+
+    def attach(self):
+        """A reader is connected: the run must not be cancelled"""
+        self.readers += 1
+        if self._cancel_timer is not None:
+            self._cancel_timer.cancel()
+            self._cancel_timer = None
+
+    def detach(self):
+        """A reader left; with none left, cancel the run unless someone reconnects in time"""
+        self.readers -= 1
+        if self.readers > 0 or self.task is None or self.task.done():
+            return
+        if self.grace <= 0:
+            self.task.cancel()
+        else:
+            self._cancel_timer = asyncio.get_running_loop().call_later(self.grace, self._cancel_if_unread)
+
+    def _cancel_if_unread(self):
+        self._cancel_timer = None
+        if self.readers == 0 and self.task is not None and not self.task.done():
+            # Nobody came back: stop spending LLM calls
+            self.task.cancel()
+
+    async def follow(self, after: int, heartbeat: str, heartbeat_interval: float) -> AsyncIterator[str]:
+        """Yield the events after seq `after`, then the rest of the run as it happens."""
+        self.attach()
+        token = object()
+        cursor = after
+        self._advance(token, cursor)
+        try:
+            while True:
+                while cursor < self.last_seq:
+                    if cursor < self.first_seq - 1:
+                        # Fell further behind than the log holds (drop policies, or readers past the log size)
+                        yield f": skipped {self.first_seq - 1 - cursor} events\n\n"
+                        cursor = self.first_seq - 1
+                        continue
+                    # Index, not iterate: the deque may rotate while we are suspended in yield
+                    yield self.events[cursor + 1 - self.first_seq][1]
+                    cursor += 1
+                    self._advance(token, cursor)
+                if self.done:
+                    return
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield heartbeat
+        finally:
+            self._advance(token, None)
+            self.detach()
+
+
+class EventLog:
+    """Run logs of this process; finished runs stay resumable for `ttl` seconds."""
+
+    def __init__(
+        self,
+        ttl: float = EVENT_LOG_TTL,
+        max_runs: int = EVENT_LOG_MAX_RUNS,
+        max_events: int = EVENT_LOG_MAX_EVENTS,
+        grace: float = SSE_RESUME_GRACE,
+    ):
+        self.ttl = ttl
+        self.max_runs = max_runs
+        self.max_events = max_events
+        self.grace = grace
+        self._runs: "OrderedDict[str, RunLog]" = OrderedDict()
+
+    def _evict(self, now: float):
+        while self._runs:
+            run_id, log = next(iter(self._runs.items()))
+            if len(self._runs) > self.max_runs or (log.done and now - log.updated > self.ttl):
+                del self._runs[run_id]
+            else:
+                break
+
+    def start(self, encode: Callable[..., str], queue_size: int = 256, policy: str = "block") -> RunLog:
+        """New log with a fresh run ID; `queue_size` and `policy` bound its live readers like an SSEStream"""
+        self._evict(time.monotonic())
+        log = RunLog(
+            uuid.uuid4().hex, encode, self.max_events, self.grace,
+            on_record=self._on_record, on_finish=self._on_finish,
+            queue_size=queue_size, policy=policy,
+        )
+        self._runs[log.run_id] = log
+        return log
+
+    def _on_record(self, log: RunLog, seq: int, chunk: str):
+        pass
+
+    def _on_finish(self, log: RunLog):
+        # Finished runs are evicted oldest-finished first
+        if self._runs.get(log.run_id) is log:
+            self._runs.move_to_end(log.run_id)
+
+    async def follow(self, run_id: str, after: int, heartbeat: str, heartbeat_interval: float) -> AsyncIterator[str]:
+        """
+        Event stream resuming after seq `after`.
+        Raises LookupError for an unknown (or expired) run and EventsExpired
+        if the log no longer holds the first missed event.
+        """
+        self._evict(time.monotonic())
+        log = self._runs.get(run_id)
+        if log is None:
+            raise LookupError(run_id)
+        if after < log.first_seq - 1:
+            raise EventsExpired(run_id)
+        return log.follow(after, heartbeat, heartbeat_interval)
+
+
+class SQLiteEventLog(EventLog):
+    """Also writes every event to a SQLite file that all workers on the host share."""
+
+    def __init__(self, path: str = EVENT_LOG_DB, poll_interval: float = EVENT_LOG_POLL_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.poll_interval = poll_interval
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS run_events (
+                run_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                chunk TEXT NOT NULL,
+                PRIMARY KEY (run_id, seq)
+            );
+            """
+        )
+        self._conn.commit()
+        self._pending: List[Tuple[str, int, str]] = []
+        self._finished: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # --- writing: events are buffered and written in batches off the event loop ---
+    def _on_record(self, log: RunLog, seq: int, chunk: str):
+        self._pending.append((log.run_id, seq, chunk))
+        self._schedule_flush()
+
+    def _on_finish(self, log: RunLog):
+        super()._on_finish(log)
+        self._finished.append(log.run_id)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        while self._pending or self._finished:
+            rows, self._pending = self._pending, []
+            finished, self._finished = self._finished, []
+            await asyncio.to_thread(self._write, rows, finished)
+
+    def _write(self, rows: List[Tuple[str, int, str]], finished: List[str]):
+        now = time.time()
+        with self._db_lock:
+            self._conn.executemany("INSERT OR REPLACE INTO run_events (run_id, seq, chunk) VALUES (?, ?, ?)", rows)
+            last_seqs = {}
+            for run_id, seq, _ in rows:
+                last_seqs[run_id] = seq
+            for run_id, seq in last_seqs.items():
+                self._conn.execute(
+                    "INSERT INTO runs (run_id, updated_at) VALUES (?, ?) "
+                    "ON CONFLICT(run_id) DO UPDATE SET updated_at = excluded.updated_at",
+                    (run_id, now),
+                )
+                # Same bound as the in-memory log
+                self._conn.execute(
+                    "DELETE FROM run_events WHERE run_id = ? AND seq <= ?", (run_id, seq - self.max_events)
+                )
+            self._conn.executemany("UPDATE runs SET done = 1 WHERE run_id = ?", [(r,) for r in finished])
+            self._evict_stored(now)
+            self._conn.commit()
+
+    def _evict_stored(self, now: float):
+        expired = [row[0] for row in self._conn.execute(
+            "SELECT run_id FROM runs WHERE updated_at < ?", (now - self.ttl,)
+        )]
+        for run_id in expired:
+            self._conn.execute("DELETE FROM run_events WHERE run_id = ?", (run_id,))
+            self._conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    # --- reading runs owned by another worker ---
+    def _read_run(self, run_id: str) -> Optional[Tuple[int, float]]:
+        """(first stored seq, updated_at), or None if the run is unknown"""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT r.updated_at, MIN(e.seq) FROM runs r LEFT JOIN run_events e ON e.run_id = r.run_id "
+                "WHERE r.run_id = ? GROUP BY r.run_id",
+                (run_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return (row[1] if row[1] is not None else 1), row[0]
+
+    def _read_events(self, run_id: str, after: int) -> Tuple[List[Tuple[int, str]], bool]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT seq, chunk FROM run_events WHERE run_id = ? AND seq > ? ORDER BY seq", (run_id, after)
+            ).fetchall()
+            done = self._conn.execute("SELECT done FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return rows, bool(done and done[0])
+
+    async def follow(self, run_id: str, after: int, heartbeat: str, heartbeat_interval: float) -> AsyncIterator[str]:
+        try:
+            return await super().follow(run_id, after, heartbeat, heartbeat_interval)
+        except LookupError:
+            pass
+        stored = await asyncio.to_thread(self._read_run, run_id)
+        if stored is None or time.time() - stored[1] > self.ttl:
+            raise LookupError(run_id)
+        if after < stored[0] - 1:
+            raise EventsExpired(run_id)
+        return self._follow_stored(run_id, after, heartbeat, heartbeat_interval)
+
+    async def _follow_stored(self, run_id: str, after: int, heartbeat: str, heartbeat_interval: float):
+        """Replay from SQLite, then poll it until the owning worker marks the run done."""
+        cursor = after
+        last_progress = last_sent = time.monotonic()
+        while True:
+            rows, done = await asyncio.to_thread(self._read_events, run_id, cursor)
+            for seq, chunk in rows:
+                yield chunk
+                cursor = seq
+            now = time.monotonic()
+            if rows:
+                last_progress = last_sent = now
+                continue
+            if done:
+                return
+            if now - last_progress > self.ttl:
+                # The owning worker went away without finishing the run
+                yield format_sse("meta", {"error": "run stopped producing events", "info": "stream_complete"})
+                return
+            if now - last_sent >= heartbeat_interval:
+                last_sent = now
+                yield heartbeat
+            await asyncio.sleep(self.poll_interval)
+
+
+def create_event_log() -> EventLog:
+    """Build the log selected by EVENT_LOG"""
+    if EVENT_LOG == "sqlite":
+        return SQLiteEventLog()
+    return EventLog()
+
+
+event_log = create_event_log()
@@ -0,0 +1,225 @@
+"""
+Fake chat model for load testing.
+Replays a short script of AI turns with configurable latency so the full
+API -> graph -> MCP path can be exercised without calling Azure.
+
+The default script asks the MCP `calculate` tool to evaluate the arithmetic
+found in the user's message, then answers with the tool result. A custom
+script can be supplied as a JSON file (FAKE_LLM_SCRIPT), a list of steps:
+    [{"content": "...", "tool_calls": [{"name": "...", "args": {...}}]}, ...]
+`{input}`, `{expression}` and `{tool_result}` placeholders are filled in from the
+conversation.
+Step N is used for the Nth AI turn after the latest human message; the last
+step repeats if the conversation runs past the end of the script.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FAKE_LLM_SCRIPT = os.getenv("FAKE_LLM_SCRIPT")
+# Seconds before the first token, and between streamed tokens
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.05"))
+FAKE_LLM_TOKEN_LATENCY = float(os.getenv("FAKE_LLM_TOKEN_LATENCY", "0.0"))
+# Fractional jitter applied to FAKE_LLM_LATENCY (0.2 -> +/-20%)
+FAKE_LLM_JITTER = float(os.getenv("FAKE_LLM_JITTER", "0.0"))
+# Probability that a call fails after its delay (exercises retries and circuit breaking)
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0.0"))
+
+DEFAULT_SCRIPT = [
+    {"tool_calls": [{"name": "calculate", "args": {"expression": "{expression}"}}]},
+    {"content": "The result is {tool_result}"},
+]
+
+_EXPRESSION_RE = re.compile(r"[\d(][\d\s.+\-*/%()]*")
+
+
+def load_script(path: Optional[str] = FAKE_LLM_SCRIPT) -> List[dict]:
+    if not path:
+        return DEFAULT_SCRIPT
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fill(value: Any, fields: dict) -> Any:
+    if isinstance(value, str):
+        for key, replacement in fields.items():
+            value = value.replace("{" + key + "}", replacement)
+        return value
+    if isinstance(value, dict):
+        return {k: _fill(v, fields) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, fields) for v in value]
+    return value
+
+
+def _tool_result(message: ToolMessage) -> str:
+    """Pull `result` out of calculate-style JSON payloads, else return the raw text."""
+    text = str(message.content)
+    try:
+        payload = json.loads(text)
+        if isinstance(payload, dict) and "structuredContent" in payload:
+            payload = json.loads(payload["structuredContent"]["result"])
+        if isinstance(payload, dict) and "result" in payload:
+            return str(payload["result"])
+    except (ValueError, TypeError, KeyError):
+        pass
+    return text
+
+
+class FakeChatModel(BaseChatModel):
+    """Scripted chat model with simulated latency and token usage."""
+
+    script: List[dict] = DEFAULT_SCRIPT
+    latency: float = FAKE_LLM_LATENCY
+    token_latency: float = FAKE_LLM_TOKEN_LATENCY
+    jitter: float = FAKE_LLM_JITTER
+    error_rate: float = FAKE_LLM_ERROR_RATE
+    model_name: str = "fake-chat"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "latency": self.latency}
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool schemas are not needed to follow the script
+        return self.bind(**kwargs)
+
+    def _delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _maybe_fail(self):
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("Injected fake model error")
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        self._maybe_fail()
+        human_idx = max(
+            (i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1
+        )
+        turn = messages[human_idx + 1:]
+        step = self.script[min(
+            sum(isinstance(m, AIMessage) for m in turn), len(self.script) - 1
+        )]
+
+        user_input = str(messages[human_idx].content) if human_idx >= 0 else ""
+        match = _EXPRESSION_RE.search(user_input)
+        tool_results = [m for m in turn if isinstance(m, ToolMessage)]
+        fields = {
+            "input": user_input,
+            "expression": match.group().strip() if match else "0",
+            "tool_result": _tool_result(tool_results[-1]) if tool_results else "",
+        }
+
+        content = _fill(step.get("content", ""), fields)
+        tool_calls = [
+            {"name": call["name"], "args": _fill(call.get("args", {}), fields),
+             "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+            for call in step.get("tool_calls", [])
+        ]
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = max(1, len(content.split()))
+        return AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._delay())
+        for chunk in self._chunks(self._next_message(messages)):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            if run_manager and chunk.message.content:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._delay())
+        for chunk in self._chunks(self._next_message(messages)):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            if run_manager and chunk.message.content:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    @staticmethod
+    def _chunks(message: AIMessage) -> Iterator[ChatGenerationChunk]:
+        """Split the reply into word chunks; tool calls and usage ride on the last one."""
+        words = re.findall(r"\S+\s*", message.content) or [""]
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=word,
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": j}
+                    for j, c in enumerate(message.tool_calls)
+                ] if last else [],
+                usage_metadata=message.usage_metadata if last else None,
+            ))
+
+
+def create_fake_model(**overrides) -> FakeChatModel:
+    """`overrides` set per-instance fields, e.g. latency/error_rate for one pool deployment"""
+    return FakeChatModel(script=load_script(), **overrides)
@@ -2,23 +2,58 @@
 from langgraph.constants import START, END
 from langgraph.graph import StateGraph
 
-from agentic_components.nodes import llm_call, tool_node, should_continue
+from agentic_components.nodes import (
+    after_tools, allm_call, atool_node, budget_exhausted, fast_path, route_start, should_continue
+)
 from agentic_components.state import MessagesState
 
-agent_builder = StateGraph(MessagesState)
+# Compiled on first use (or by the API's startup hook), not at import time
+_agent = None
 
-# Add nodes
-agent_builder.add_node("llm_call", llm_call)
-agent_builder.add_node("tool_node", tool_node)
 
-# Add edges to connect nodes
-agent_builder.add_edge(START, "llm_call")
-agent_builder.add_conditional_edges(
-    "llm_call",
-    should_continue,
-    ["tool_node", END]
-)
-agent_builder.add_edge("tool_node", "llm_call")
+def build_agent():
+    """Build and compile the agent graph"""
+    agent_builder = StateGraph(MessagesState)
+
+    # Add nodes (async variants so graph runs never block the API event loop)
+    agent_builder.add_node("llm_call", allm_call)
+    agent_builder.add_node("tool_node", atool_node)
+    agent_builder.add_node("fast_path", fast_path)
+    agent_builder.add_node("budget_exhausted", budget_exhausted)
+
+    # Add edges to connect nodes
+    agent_builder.add_conditional_edges(
+        START,
+        route_start,
+        ["fast_path", "llm_call"]
+    )
+    agent_builder.add_edge("fast_path", END)
+    agent_builder.add_conditional_edges(
+        "llm_call",
+        should_continue,
+        ["tool_node", "budget_exhausted", END]
+    )
+    agent_builder.add_conditional_edges(
+        "tool_node",
+        after_tools,
+        ["llm_call", "budget_exhausted"]
+    )
+    agent_builder.add_edge("budget_exhausted", END)
+
+    # Compile the agent
+    return agent_builder.compile()
+
+
+def get_agent():
+    """Shared compiled graph, built on first call"""
+    global _agent
+    if _agent is None:
+        _agent = build_agent()
+    return _agent
+
 
-# Compile the agent
-agent = agent_builder.compile()
+def __getattr__(name):
+    # Backwards-compatible `from agentic_components.graph import agent`
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,10 @@
 # Load environment variables from .env
+import json
 import os
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
-from langchain_openai import AzureChatOpenAI
 from agentic_components.mcp_tools import get_builtin_tools
+from agentic_components.tool_registry import ToolRegistry
 
 load_dotenv()
 
@@ -12,15 +14,78 @@ AZURE_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
 AZURE_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 
-# Initialize Azure OpenAI model via LangChain
-_base_model = AzureChatOpenAI(
-    openai_api_key=AZURE_API_KEY,
-    azure_endpoint=AZURE_ENDPOINT,
-    openai_api_version=AZURE_API_VERSION,
-    model=AZURE_DEPLOYMENT_NAME,
-    temperature=0.2,
-)
-
-# Get built-in tools and bind to model
-_tools = get_builtin_tools()
-model = _base_model.bind_tools(_tools)
\ No newline at end of file
+# "azure" (default) or "fake" (scripted model for load tests, see fake_llm.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "azure").lower()
+
+# Optional deployment pool (model_pool.py): a JSON list, or a path to a JSON file, of
+#   azure: {"name", "deployment", "endpoint", "api_key", "api_version"}  (missing keys use the AZURE_* vars)
+#   fake:  {"name", "latency", "token_latency", "jitter", "error_rate"}
+LLM_DEPLOYMENTS = os.getenv("LLM_DEPLOYMENTS")
+
+# Built on first use (or by the API's startup hook), not at import time
+_tool_registry = None
+
+
+def load_deployment_specs(value: Optional[str] = LLM_DEPLOYMENTS) -> List[Dict[str, Any]]:
+    if not value:
+        return []
+    if value.lstrip().startswith("["):
+        return json.loads(value)
+    with open(value, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def create_chat_model(spec: Optional[Dict[str, Any]] = None, pooled: bool = False):
+    """One chat model; provider SDKs are imported here so importing this module stays cheap."""
+    spec = dict(spec or {})
+    spec.pop("name", None)
+    if LLM_PROVIDER == "fake":
+        from agentic_components.fake_llm import create_fake_model
+        return create_fake_model(**spec)
+
+    # Initialize Azure OpenAI model via LangChain
+    from langchain_openai import AzureChatOpenAI
+    return AzureChatOpenAI(
+        openai_api_key=spec.get("api_key", AZURE_API_KEY),
+        azure_endpoint=spec.get("endpoint", AZURE_ENDPOINT),
+        openai_api_version=spec.get("api_version", AZURE_API_VERSION),
+        model=spec.get("deployment", AZURE_DEPLOYMENT_NAME),
+        temperature=0.2,
+        # Rate-limit headers let the pool route by remaining quota
+        include_response_headers=pooled,
+    )
+
+
+def create_base_model():
+    """The chat model, or a ModelPool over LLM_DEPLOYMENTS when configured"""
+    specs = load_deployment_specs()
+    if not specs:
+        return create_chat_model()
+
+    from agentic_components.model_pool import Deployment, ModelPool
+    return ModelPool([
+        Deployment(spec.get("name") or f"deployment-{i}", create_chat_model(spec, pooled=True))
+        for i, spec in enumerate(specs)
+    ])
+
+
+def create_tool_registry(base_model=None) -> ToolRegistry:
+    """Built-in tools bound to the model; the registry adds MCP tools and keeps the model bound to both"""
+    return ToolRegistry(base_model or create_base_model(), get_builtin_tools())
+
+
+def get_tool_registry() -> ToolRegistry:
+    """Shared registry, created on first call"""
+    global _tool_registry
+    if _tool_registry is None:
+        _tool_registry = create_tool_registry()
+    return _tool_registry
+
+
+def __getattr__(name):
+    # Backwards-compatible `from agentic_components.llm import tool_registry, model`
+    if name == "tool_registry":
+        return get_tool_registry()
+    if name == "model":
+        return get_tool_registry().model
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,152 @@
+"""
+LLM Response Cache
+------------------
+Caches model responses keyed on a stable hash of the normalized prompt
+(system prompt + messages), the bound tool schemas and the model
+parameters. Lookups go to an in-memory LRU first and then to an optional
+SQLite file that survives restarts. Cached responses are full
+`AIMessage`s, including their `tool_calls`.
+
+Configure with:
+    LLM_CACHE_ENABLED   (default true)
+    LLM_CACHE_SIZE      in-memory entries (default 512)
+    LLM_CACHE_TTL       seconds (default 3600)
+    LLM_CACHE_DB        path to a SQLite file to enable the on-disk tier
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+
+from agentic_components.cache import LRUCache, stable_hash
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB")
+
+
+class SQLiteCacheBackend:
+    """On-disk key/value tier with per-entry expiry."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at and expires_at < time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float]):
+        expires_at = time.time() + ttl if ttl else 0.0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _normalize_message(message: BaseMessage) -> Dict[str, Any]:
+    """Keep only the fields that affect the model's answer (drops ids and metadata)"""
+    normalized = {"type": message.type, "content": message.content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        normalized["tool_calls"] = [{"name": tc["name"], "args": tc["args"]} for tc in tool_calls]
+    return normalized
+
+
+def model_params(model) -> Dict[str, Any]:
+    """Parameters of the base model that change its output"""
+    return {
+        "model": getattr(model, "model_name", None),
+        "deployment": getattr(model, "deployment_name", None),
+        "temperature": getattr(model, "temperature", None),
+    }
+
+
+class LLMResponseCache:
+    """Two-tier (memory, optional SQLite) cache of model responses."""
+
+    def __init__(
+        self,
+        maxsize: int = LLM_CACHE_SIZE,
+        ttl: float = LLM_CACHE_TTL,
+        db_path: Optional[str] = LLM_CACHE_DB,
+        enabled: bool = LLM_CACHE_ENABLED,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteCacheBackend(db_path) if (enabled and db_path) else None
+        self.disk_hits = 0
+
+    def make_key(self, messages: List[BaseMessage], tools_signature: str, params: Dict[str, Any]) -> str:
+        return stable_hash({
+            "messages": [_normalize_message(m) for m in messages],
+            "tools": tools_signature,
+            "params": params,
+        })
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        if not self.enabled:
+            return None
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        if value is None:
+            return None
+        return messages_from_dict([json.loads(value)])[0]
+
+    def set(self, key: str, response: BaseMessage):
+        if not self.enabled or not isinstance(response, AIMessage):
+            return
+        value = json.dumps(message_to_dict(response), default=str)
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value, self.ttl)
+
+    async def aget(self, key: str) -> Optional[AIMessage]:
+        # Memory hits are answered inline; only the SQLite tier goes to a thread
+        if self.disk is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, response: BaseMessage):
+        if self.disk is None:
+            return self.set(key, response)
+        await asyncio.to_thread(self.set, key, response)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.memory.stats(), "disk_hits": self.disk_hits, "disk": self.disk is not None}
+
+
+# Shared response cache used by allm_call
+llm_response_cache = LLMResponseCache()
@@ -5,54 +5,277 @@ Loads tools from the MCP server and converts them to LangChain tools.
 """
 
 import json
+import os
 import httpx
 import asyncio
-from typing import Any, Dict, List
-from langchain_core.tools import Tool, StructuredTool
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field, create_model
 
+from agentic_components.budget import budget_timeout
+from agentic_components.metrics import timed, mcp_latency, mcp_calls
+
 # MCP Server endpoint
-MCP_SERVER_URL = "http://127.0.0.1:8080/mcp"
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://127.0.0.1:8080/mcp")
+
+# Connection pool settings for the shared MCP client
+MCP_MAX_CONNECTIONS = int(os.getenv("MCP_MAX_CONNECTIONS", "20"))
+MCP_MAX_KEEPALIVE = int(os.getenv("MCP_MAX_KEEPALIVE", "10"))
+MCP_KEEPALIVE_EXPIRY = float(os.getenv("MCP_KEEPALIVE_EXPIRY", "30"))
+MCP_HTTP2 = os.getenv("MCP_HTTP2", "false").lower() in ("1", "true", "yes")
+# Send the MCP calls of one tool-node turn as a single /tools/call_batch request
+MCP_BATCH_ENABLED = os.getenv("MCP_BATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+# Keep-alive connections opened by warm_up() before the first request
+MCP_WARMUP_CONNECTIONS = int(os.getenv("MCP_WARMUP_CONNECTIONS", "2"))
+
+
+class MCPClientManager:
+    """
+    Owns one long-lived httpx.AsyncClient for all MCP traffic.
+
+    The client is created lazily on first use (or in `start()`), keeps
+    connections alive between calls and is closed by `aclose()` on app
+    shutdown. If it is used from a different event loop than the one it
+    was created on, it is transparently recreated.
+    """
+
+    def __init__(
+        self,
+        base_url: str = MCP_SERVER_URL,
+        max_connections: int = MCP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = MCP_MAX_KEEPALIVE,
+        keepalive_expiry: float = MCP_KEEPALIVE_EXPIRY,
+        http2: bool = MCP_HTTP2,
+    ):
+        self.base_url = base_url
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Cleared if the server turns out not to serve /tools/call_batch
+        self.batch_supported = True
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("Warning: MCP_HTTP2 requested but 'h2' is not installed; using HTTP/1.1")
+                http2 = False
+        return httpx.AsyncClient(base_url=self.base_url, limits=self.limits, http2=http2)
+
+    async def start(self) -> httpx.AsyncClient:
+        """Create the pooled client for the running loop (idempotent)"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = self._build_client()
+            self._loop = loop
+        return self._client
+
+    async def aclose(self):
+        """Close the pooled client and drop its connections"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    async def warm_up(self, connections: int = MCP_WARMUP_CONNECTIONS) -> int:
+        """
+        Open up to `connections` pooled connections ahead of traffic.
+        Any HTTP response counts (the path need not exist); failures are ignored.
+        Returns the number of connections that answered.
+        """
+        client = await self.start()
+        results = await asyncio.gather(
+            *(client.head("", timeout=5.0) for _ in range(max(0, connections))),
+            return_exceptions=True,
+        )
+        return sum(not isinstance(r, BaseException) for r in results)
+
+    async def post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: float,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> httpx.Response:
+        client = await self.start()
+        return await client.post(path, json=payload, timeout=timeout, headers=headers)
+
+
+# Shared client manager, started/stopped by the API lifespan
+mcp_client = MCPClientManager()
+
+
+async def fetch_mcp_tool_defs(etag: Optional[str] = None) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    Fetch tool definitions from the MCP server, honouring ETags.
+
+    Returns (tools, etag). `tools` is None when the server answered
+    304 Not Modified for the given etag. Raises on transport/HTTP errors
+    so callers can keep their previous tool set.
+    """
+    headers = {"If-None-Match": etag} if etag else None
+    response = await mcp_client.post("/tools/list", {}, timeout=5.0, headers=headers)
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    return response.json().get("tools", []), response.headers.get("ETag")
 
 async def fetch_mcp_tools() -> List[Dict[str, Any]]:
     """Fetch available tools from the MCP server"""
     try:
-        async with httpx.AsyncClient() as client:
-            # Attempt to fetch tools from the MCP server
-            response = await client.post(
-                f"{MCP_SERVER_URL}/tools/list",
-                json={},
-                timeout=5.0
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("tools", [])
+        # Attempt to fetch tools from the MCP server
+        tools, _ = await fetch_mcp_tool_defs()
+        return tools or []
     except Exception as e:
         print(f"Warning: Could not fetch tools from MCP: {e}")
 
     return []
 
+def _deadline(timeout: float) -> Dict[str, Any]:
+    """HTTP timeout capped by the run's remaining budget, also sent to the server as X-Deadline-Ms"""
+    timeout = budget_timeout(timeout)
+    return {"timeout": timeout, "headers": {"X-Deadline-Ms": str(int(timeout * 1000))}}
+
+
 async def call_mcp_tool(tool_name: str, **kwargs) -> str:
     """Call a tool via the MCP server"""
+    status = "ok"
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{MCP_SERVER_URL}/tools/call",
-                json={
+        with timed(mcp_latency, f"mcp:{tool_name}", tool=tool_name):
+            response = await mcp_client.post(
+                "/tools/call",
+                {
                     "name": tool_name,
                     "arguments": kwargs
                 },
-                timeout=10.0
+                **_deadline(10.0)
             )
-            if response.status_code == 200:
-                result = response.json()
-                return json.dumps(result)
-            else:
-                return f"Error: {response.status_code} - {response.text}"
+        if response.status_code == 200:
+            result = response.json()
+            return json.dumps(result)
+        else:
+            status = "http_error"
+            return f"Error: {response.status_code} - {response.text}"
     except Exception as e:
+        status = "error"
         return f"Error calling tool: {str(e)}"
+    finally:
+        mcp_calls.inc(tool=tool_name, status=status)
 
-async def create_langchain_tools() -> List[Tool]:
+async def call_mcp_tools_batch(calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+    """
+    Call several MCP tools in one round trip; results come back in call order,
+    formatted like call_mcp_tool's (per-call failures as "Error: ..." strings).
+    Falls back to concurrent single calls if batching is off or unsupported.
+    """
+    if not MCP_BATCH_ENABLED or not mcp_client.batch_supported or len(calls) < 2:
+        return list(await asyncio.gather(*(call_mcp_tool(name, **arguments) for name, arguments in calls)))
+
+    statuses = ["ok"] * len(calls)
+    try:
+        with timed(mcp_latency, "mcp:batch", tool="batch"):
+            response = await mcp_client.post(
+                "/tools/call_batch",
+                {"calls": [{"name": name, "arguments": arguments} for name, arguments in calls]},
+                **_deadline(10.0)
+            )
+        if response.status_code in (404, 405):
+            # Older server without the batch route: stop trying and call one by one
+            mcp_client.batch_supported = False
+            statuses = []
+            return await call_mcp_tools_batch(calls)
+        if response.status_code != 200:
+            statuses = ["http_error"] * len(calls)
+            return [f"Error: {response.status_code} - {response.text}"] * len(calls)
+
+        results = []
+        for i, item in enumerate(response.json()["results"]):
+            if item.get("isError"):
+                statuses[i] = "error"
+                results.append(f"Error: {item.get('error', 'tool call failed')}")
+            else:
+                results.append(json.dumps(item))
+        return results
+    except Exception as e:
+        statuses = ["error"] * len(calls)
+        return [f"Error calling tool: {str(e)}"] * len(calls)
+    finally:
+        for (name, _), status in zip(calls, statuses):
+            mcp_calls.inc(tool=name, status=status)
+
+
+def mcp_call_args(tool: StructuredTool, tool_args: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    (name, arguments) for calling an MCP-backed tool directly, validated the way
+    tool.ainvoke would; None for other tools or invalid args (ainvoke reports those).
+    """
+    if not (tool.metadata or {}).get("mcp"):
+        return None
+    try:
+        validated = tool.args_schema.model_validate(tool_args).model_dump()
+    except Exception:
+        return None
+    return tool.name, {k: v for k, v in validated.items() if k in tool_args and v is not None}
+
+# JSON Schema type -> Python type for building args schemas
+_JSON_SCHEMA_TYPES = {
+    "string": str,
+    "number": float,
+    "integer": int,
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+def _schema_type(prop: Dict[str, Any]) -> Any:
+    """Resolve the Python type of a JSON Schema property (handles Optional anyOf)"""
+    if "anyOf" in prop:
+        for option in prop["anyOf"]:
+            if option.get("type") != "null":
+                return _schema_type(option)
+    return _JSON_SCHEMA_TYPES.get(prop.get("type"), Any)
+
+def build_args_schema(tool_name: str, input_schema: Dict[str, Any]) -> type[BaseModel]:
+    """Build a pydantic args model from an MCP tool's inputSchema"""
+    properties = input_schema.get("properties", {})
+    required = set(input_schema.get("required", []))
+    fields = {}
+
+    for prop_name, prop in properties.items():
+        prop_type = _schema_type(prop)
+        description = prop.get("description")
+        if prop_name in required:
+            fields[prop_name] = (prop_type, Field(..., description=description))
+        else:
+            fields[prop_name] = (Optional[prop_type], Field(default=prop.get("default"), description=description))
+
+    return create_model(f"{tool_name}_args", **fields)
+
+def make_mcp_tool(tool_def: Dict[str, Any]) -> StructuredTool:
+    """Wrap one MCP tool definition as a native async StructuredTool"""
+    tool_name = tool_def.get("name", "")
+
+    async def tool_coroutine(**kwargs) -> str:
+        # Drop unset optional args so the server applies its own defaults
+        return await call_mcp_tool(tool_name, **{k: v for k, v in kwargs.items() if v is not None})
+
+    return StructuredTool.from_function(
+        coroutine=tool_coroutine,
+        name=tool_name,
+        description=tool_def.get("description", "") or tool_name,
+        args_schema=build_args_schema(tool_name, tool_def.get("inputSchema", {})),
+        # Tools registered with meta={"deterministic": True} on the server can be memoized
+        metadata={"deterministic": bool((tool_def.get("_meta") or {}).get("deterministic")), "mcp": True},
+    )
+
+async def create_langchain_tools() -> List[StructuredTool]:
     """Create LangChain tools from MCP server"""
     tools = []
 
@@ -60,26 +283,7 @@ async def create_langchain_tools() -> List[Tool]:
         mcp_tools = await fetch_mcp_tools()
 
         for tool_def in mcp_tools:
-            tool_name = tool_def.get("name", "")
-            tool_desc = tool_def.get("description", "")
-            tool_params = tool_def.get("inputSchema", {}).get("properties", {})
-
-            # Create a function for this tool
-            async def tool_func(tool_n=tool_name, **kwargs) -> str:
-                return await call_mcp_tool(tool_n, **kwargs)
-
-            # Create LangChain Tool
-            def make_tool_func(tn):
-                def tool_func(**kw):
-                    return asyncio.run(call_mcp_tool(tn, **kw))
-                return tool_func
-
-            tool = Tool(
-                name=tool_name,
-                description=tool_desc,
-                func=make_tool_func(tool_name)
-            )
-            tools.append(tool)
+            tools.append(make_mcp_tool(tool_def))
 
     except Exception as e:
         print(f"Error creating LangChain tools: {e}")
@@ -112,24 +316,28 @@ def get_builtin_tools() -> List[StructuredTool]:
     add_tool = StructuredTool.from_function(
         func=add_func,
         name="add",
+        metadata={"deterministic": True},
         description="Add two numbers together"
     )
 
     subtract_tool = StructuredTool.from_function(
         func=subtract_func,
         name="subtract",
+        metadata={"deterministic": True},
         description="Subtract b from a"
     )
 
     multiply_tool = StructuredTool.from_function(
         func=multiply_func,
         name="multiply",
+        metadata={"deterministic": True},
         description="Multiply two numbers together"
     )
 
     divide_tool = StructuredTool.from_function(
         func=divide_func,
         name="divide",
+        metadata={"deterministic": True},
         description="Divide a by b"
     )
 
@@ -0,0 +1,222 @@
+"""
+Metrics & Tracing
+-----------------
+A small in-process metrics registry rendered in the Prometheus text
+exposition format, plus per-request trace spans.
+
+    from agentic_components.metrics import node_latency, timed
+    with timed(node_latency, "llm_call", node="llm_call"):
+        ...
+
+`timed` observes the histogram and, when a trace is active for the
+current request (see `start_trace`), also records a span. Traces live in
+a ContextVar, so tasks spawned by the graph inherit them.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, value: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[Any, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, series in sorted(self._values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge whose samples are read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...], collect: Callable[[], Dict[Tuple[Any, ...], float]]):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...], collect) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ----------------------------------------------------------------------
+# Agent metrics
+# ----------------------------------------------------------------------
+node_latency = registry.histogram("agent_node_latency_seconds", "Latency of graph nodes", ("node",))
+llm_tokens = registry.counter("agent_llm_tokens_total", "Tokens used by model calls", ("kind",))
+llm_cache_hits = registry.counter("agent_llm_cache_hits_total", "Model calls answered from the response cache")
+tool_latency = registry.histogram("agent_tool_latency_seconds", "Latency of individual tool calls", ("tool",))
+tool_calls = registry.counter("agent_tool_calls_total", "Tool calls by outcome", ("tool", "status"))
+mcp_latency = registry.histogram("mcp_client_call_latency_seconds", "Latency of MCP tool calls over HTTP", ("tool",))
+mcp_calls = registry.counter("mcp_client_calls_total", "MCP tool calls over HTTP by outcome", ("tool", "status"))
+queue_wait = registry.histogram("agent_queue_wait_seconds", "Time spent waiting for an admission slot", ("gate",))
+sse_bytes = registry.counter("agent_sse_bytes_sent_total", "Bytes sent on SSE/NDJSON streams", ("endpoint",))
+
+
+# ----------------------------------------------------------------------
+# Tracing
+# ----------------------------------------------------------------------
+class Trace:
+    """Spans recorded during one request, relative to its start."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, name: str, start: float, end: float, **attrs):
+        span = {
+            "name": name,
+            "start_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        }
+        if attrs:
+            span["attrs"] = attrs
+        self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def start_trace() -> Trace:
+    """Begin a trace for the current request context"""
+    trace = Trace()
+    current_trace.set(trace)
+    return trace
+
+
+def record_span(name: str, start: float, end: float, **attrs):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, start, end, **attrs)
+
+
+@contextmanager
+def timed(histogram: Optional[Histogram], span_name: str, **labels):
+    """Observe the block's duration in `histogram` and as a span of the current trace"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        if histogram is not None:
+            histogram.observe(end - start, **labels)
+        record_span(span_name, start, end, **labels)
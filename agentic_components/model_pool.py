@@ -0,0 +1,305 @@
+"""
+Model Pool
+----------
+Spreads model calls over several deployments of the same model.
+
+Each call goes to the healthy deployment with the lowest expected cost:
+EWMA latency, scaled up by calls already in flight and down by the
+rate-limit headroom the deployment last reported. A deployment that fails
+LLM_POOL_FAILURE_THRESHOLD times in a row is taken out of rotation for
+LLM_POOL_COOLDOWN seconds (circuit breaker), then gets one probe call.
+A failed call is retried once on another deployment.
+
+With LLM_HEDGE_ENABLED, a call still running after the deployment's p95
+latency gets a second, "hedged" request on another deployment. Whichever
+answers first wins and the other is cancelled. The hedged request runs
+without callbacks, so token streams only come from the primary; if the
+hedge wins, its reply is streamed as one final message.
+
+The pool mimics a chat model: `bind_tools()` returns a pool view whose
+deployments are all bound to the same tools, sharing the pool's stats.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+from agentic_components.metrics import registry
+
+# Circuit breaker: consecutive failures before a deployment is skipped, and for how long
+LLM_POOL_FAILURE_THRESHOLD = int(os.getenv("LLM_POOL_FAILURE_THRESHOLD", "3"))
+LLM_POOL_COOLDOWN = float(os.getenv("LLM_POOL_COOLDOWN", "30"))
+# Smoothing of the per-deployment latency average
+LLM_POOL_EWMA_ALPHA = float(os.getenv("LLM_POOL_EWMA_ALPHA", "0.2"))
+# Hedged requests (off by default: they can double model spend on slow calls)
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.05"))
+# Latency samples a deployment needs before its p95 is trusted as a hedge delay
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+_LATENCY_WINDOW = 200
+
+deployment_latency = registry.histogram(
+    "agent_llm_deployment_latency_seconds", "Latency of model calls per deployment", ("deployment",)
+)
+deployment_calls = registry.counter(
+    "agent_llm_deployment_calls_total", "Model calls per deployment by outcome", ("deployment", "status")
+)
+hedged_calls = registry.counter(
+    "agent_llm_hedged_calls_total", "Hedged model calls by winner", ("winner",)
+)
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _retry_after(error: BaseException, default: float) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+
+class Deployment:
+    """One model endpoint plus its health and latency statistics."""
+
+    def __init__(self, name: str, model):
+        self.name = name
+        self.model = model
+
+        self.ewma = 0.0              # seconds; 0 until the first sample, so new deployments get tried
+        self.samples: deque = deque(maxlen=_LATENCY_WINDOW)
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0        # circuit open (skipped) until this monotonic time
+        self.probing = False         # half-open: one trial call in flight
+        self.headroom = 1.0          # remaining / limit from rate-limit headers (1 if unknown)
+        self.limited_until = 0.0     # rate limited (429) until this monotonic time
+
+    def available(self, now: float) -> bool:
+        if now < self.limited_until:
+            return False
+        if now < self.open_until:
+            return False
+        # Past the cooldown: allow a single probe call
+        return not (self.open_until and self.probing)
+
+    def cost(self) -> float:
+        return self.ewma * (1 + self.in_flight) / max(self.headroom, 0.05)
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def begin(self):
+        self.in_flight += 1
+        self.calls += 1
+        if self.open_until:
+            self.probing = True
+
+    def succeeded(self, elapsed: float, response=None):
+        self.in_flight -= 1
+        self.ewma = elapsed if not self.ewma else self.ewma + LLM_POOL_EWMA_ALPHA * (elapsed - self.ewma)
+        self.samples.append(elapsed)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self._read_headroom(response)
+        deployment_latency.observe(elapsed, deployment=self.name)
+        deployment_calls.inc(deployment=self.name, status="ok")
+
+    def failed(self, error: BaseException):
+        self.in_flight -= 1
+        self.probing = False
+        if _is_rate_limited(error):
+            # Out of quota is not a health problem: just skip it until the window resets
+            self.limited_until = time.monotonic() + _retry_after(error, LLM_POOL_COOLDOWN)
+            deployment_calls.inc(deployment=self.name, status="rate_limited")
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= LLM_POOL_FAILURE_THRESHOLD:
+            self.open_until = time.monotonic() + LLM_POOL_COOLDOWN
+        deployment_calls.inc(deployment=self.name, status="error")
+
+    def cancelled(self):
+        self.in_flight -= 1
+        self.probing = False
+        deployment_calls.inc(deployment=self.name, status="cancelled")
+
+    def _read_headroom(self, response):
+        """Azure/OpenAI x-ratelimit-* headers (AzureChatOpenAI include_response_headers=True)"""
+        # Taken off the message: only the pool needs them, not SSE clients or the LLM cache
+        headers = (getattr(response, "response_metadata", None) or {}).pop("headers", None) or {}
+        ratios = []
+        for kind in ("requests", "tokens"):
+            try:
+                remaining = float(headers[f"x-ratelimit-remaining-{kind}"])
+                limit = float(headers[f"x-ratelimit-limit-{kind}"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if limit > 0:
+                ratios.append(remaining / limit)
+        if ratios:
+            self.headroom = min(ratios)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "ewma_latency": self.ewma,
+            "p95_latency": self.p95(),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "failures": self.failures,
+            "circuit": "open" if now < self.open_until else ("half_open" if self.open_until else "closed"),
+            "headroom": self.headroom,
+            "rate_limited": now < self.limited_until,
+        }
+
+
+class ModelPool:
+    """Routes model calls across deployments; usable wherever a chat model is."""
+
+    def __init__(self, deployments: Sequence[Deployment], hedge: bool = LLM_HEDGE_ENABLED, max_attempts: int = 2):
+        if not deployments:
+            raise ValueError("ModelPool needs at least one deployment")
+        self.deployments = list(deployments)
+        self.hedge = hedge
+        self.max_attempts = max_attempts
+
+        # Read by llm_cache.model_params: the pool answers as one logical model
+        first = self.deployments[0].model
+        self.model_name = getattr(first, "model_name", None)
+        self.deployment_name = "pool:" + ",".join(sorted(d.name for d in self.deployments))
+        self.temperature = getattr(first, "temperature", None)
+
+    def bind_tools(self, tools, **kwargs) -> "ModelPool":
+        """Pool view with every deployment bound to `tools`; health stats stay shared"""
+        view = ModelPool.__new__(ModelPool)
+        view.__dict__.update(self.__dict__)
+        view.deployments = [_BoundDeployment(d, d.model.bind_tools(tools, **kwargs)) for d in self.deployments]
+        return view
+
+    def select(self, exclude: Sequence[Any] = ()) -> Optional[Deployment]:
+        """Cheapest available deployment; if none is available, the one whose circuit reopens first"""
+        now = time.monotonic()
+        candidates = [d for d in self.deployments if d not in exclude]
+        if not candidates:
+            return None
+        available = [d for d in candidates if d.available(now)]
+        if available:
+            return min(available, key=lambda d: d.cost())
+        if exclude:
+            return None
+        # Everything is unhealthy: try the deployment that should recover soonest
+        return min(candidates, key=lambda d: max(d.open_until, d.limited_until))
+
+    def invoke(self, prompt, config=None, **kwargs):
+        tried: List[Deployment] = []
+        while True:
+            deployment = self.select(exclude=tried)
+            if deployment is None:
+                raise RuntimeError("No model deployment available")
+            tried.append(deployment)
+            deployment.begin()
+            start = time.perf_counter()
+            try:
+                response = deployment.model.invoke(prompt, config, **kwargs)
+            except Exception as e:
+                deployment.failed(e)
+                if len(tried) >= self.max_attempts:
+                    raise
+                continue
+            deployment.succeeded(time.perf_counter() - start, response)
+            return response
+
+    async def _call(self, deployment: Deployment, prompt, config, kwargs):
+        deployment.begin()
+        start = time.perf_counter()
+        try:
+            response = await deployment.model.ainvoke(prompt, config, **kwargs)
+        except asyncio.CancelledError:
+            deployment.cancelled()
+            raise
+        except Exception as e:
+            deployment.failed(e)
+            raise
+        deployment.succeeded(time.perf_counter() - start, response)
+        return response
+
+    async def ainvoke(self, prompt, config=None, **kwargs):
+        tried: List[Deployment] = []
+        while True:
+            deployment = self.select(exclude=tried)
+            if deployment is None:
+                raise RuntimeError("No model deployment available")
+            tried.append(deployment)
+            try:
+                return await self._hedged_call(deployment, tried, prompt, config, kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if len(tried) >= self.max_attempts:
+                    raise
+
+    async def _hedged_call(self, primary: Deployment, tried: List[Deployment], prompt, config, kwargs):
+        delay = primary.p95() if self.hedge else None
+        if delay is None:
+            return await self._call(primary, prompt, config, kwargs)
+
+        first = asyncio.ensure_future(self._call(primary, prompt, config, kwargs))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=max(delay, LLM_HEDGE_MIN_DELAY))
+            backup = None if done else self.select(exclude=tried)
+            if backup is None:
+                return await first
+
+            tried.append(backup)
+            # No callbacks on the hedge, so streamed tokens only come from the primary
+            second = asyncio.ensure_future(self._call(backup, prompt, {**(config or {}), "callbacks": []}, kwargs))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        hedged_calls.inc(winner="hedge" if task is second else "primary")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hedge": self.hedge, "deployments": {d.name: d.stats() for d in self.deployments}}
+
+
+class _BoundDeployment:
+    """A deployment seen through a tool-bound model; all state lives on the original."""
+
+    def __init__(self, deployment: Deployment, model):
+        object.__setattr__(self, "_deployment", deployment)
+        object.__setattr__(self, "model", model)
+
+    def __getattr__(self, name):
+        return getattr(self._deployment, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._deployment, name, value)
+
+    def __eq__(self, other):
+        return self._deployment is getattr(other, "_deployment", other)
+
+    def __hash__(self):
+        return id(self._deployment)
@@ -1,78 +1,313 @@
-from langchain.messages import SystemMessage
 from langchain.messages import ToolMessage
+from langchain.messages import AIMessage
 from agentic_components.state import MessagesState
-from agentic_components.llm import model, _tools
+from agentic_components.llm import get_tool_registry
+from agentic_components.context import prepare_prompt
+from agentic_components.cache import tool_result_cache, is_deterministic, tool_cache_key
+from agentic_components.mcp_tools import call_mcp_tools_batch, mcp_call_args
+from agentic_components.llm_cache import llm_response_cache, model_params
+from agentic_components.admission import AdmissionRejected, llm_gate
+from agentic_components.budget import budget_timeout, current_budget
+from agentic_components.metrics import timed, node_latency, llm_tokens, llm_cache_hits, tool_latency, tool_calls
+from agentic_components.tools.math_tools import _safe_eval_expr
 from typing import Literal
 from langgraph.graph import END
-import json
+from langgraph.types import Send
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import re
 
-# Create a mapping of tool names to tool objects
-_tools_by_name = {tool.name: tool for tool in _tools}
+# Per-call timeout (seconds) and size of the thread pool used for sync tools
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", "30"))
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
 
-def llm_call(state: dict):
-    """LLM decides whether to call a tool or not"""
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+
+# Input made only of numbers, arithmetic operators and parentheses
+_ARITHMETIC_RE = re.compile(r"^[\d\s.+\-*/%()]*\d[\d\s.+\-*/%()]*$")
+# ...with at least one binary operator between two operands ("2024" alone is not a calculation)
+_BINARY_OP_RE = re.compile(r"[\d.)]\s*(\*\*|//|[-+*/%])\s*[-+]*\s*[\d.(]")
+# Hyphenated digit groups read as phone numbers, dates or IDs: "555-1234", "2024-01-15"
+_DIGIT_GROUPS_RE = re.compile(r"\d{3,}-\d{3,}|\d-\d+-\d")
+
+SYSTEM_PROMPT = "You are a helpful assistant tasked with performing arithmetic on a set of inputs. Use available tools when needed."
+
+
+def _llm_cache_key(prompt: list) -> str:
+    """Cache key for a prompt under the currently bound tools and model parameters"""
+    registry = get_tool_registry()
+    return llm_response_cache.make_key(prompt, registry.tools_signature, model_params(registry.base_model))
+
+
+def _record_llm_usage(response, cached: bool):
+    """Count tokens of a fresh model response, or a cache hit, and charge the run's budget"""
+    usage = {} if cached else (getattr(response, "usage_metadata", None) or {})
+    budget = current_budget.get()
+    if budget is not None:
+        budget.charge_llm(usage.get("total_tokens", 0))
+    if cached:
+        llm_cache_hits.inc()
+        return
+    llm_tokens.inc(usage.get("input_tokens", 0), kind="prompt")
+    llm_tokens.inc(usage.get("output_tokens", 0), kind="completion")
+
+
+async def allm_call(state: dict):
+    """LLM decides whether to call a tool or not; awaits the model so the event loop stays free"""
     try:
-        # model is already bound with tools
-        response = model.invoke(
-            [
-                SystemMessage(
-                    content="You are a helpful assistant tasked with performing arithmetic on a set of inputs. Use available tools when needed."
-                )
-            ]
-            + state["messages"]
-        )
+        # Pick up newly discovered MCP tools without waiting on discovery
+        get_tool_registry().maybe_refresh()
+
+        with timed(node_latency, "llm_call", node="llm_call"):
+            prompt = prepare_prompt(SYSTEM_PROMPT, state["messages"])
+            cache_key = _llm_cache_key(prompt)
+
+            response = await llm_response_cache.aget(cache_key)
+            cached = response is not None
+            if not cached:
+                # model is already bound with tools; llm_gate caps concurrent Azure calls.
+                # Both the queue wait and the call itself end at the run's deadline.
+                budget = current_budget.get()
+                async with llm_gate.slot(budget.deadline if budget is not None else None):
+                    response = await asyncio.wait_for(
+                        get_tool_registry().model.ainvoke(prompt), timeout=budget_timeout(None)
+                    )
+                await llm_response_cache.aset(cache_key, response)
+            _record_llm_usage(response, cached)
 
         return {
             "messages": [response],
             "llm_calls": state.get('llm_calls', 0) + 1
         }
+    except (asyncio.TimeoutError, AdmissionRejected):
+        budget = current_budget.get()
+        if budget is not None and budget.exhausted() == "deadline":
+            # should_continue routes to budget_exhausted for the best-effort answer
+            return {"messages": []}
+        raise
     except Exception as e:
         print(f"Error in llm_call: {e}")
         raise
 
 
-def tool_node(state: dict):
-    """Performs the tool call"""
-    result = []
+async def _run_tool_call(tool_call: dict, batch=None) -> ToolMessage:
+    """
+    Run a single tool call with its own timeout; never raises.
+    `batch` is (task, position) when the call rides on a shared MCP batch request.
+    """
+    tool_name = tool_call["name"]
+    tool_args = tool_call["args"]
+    status = "ok"
+    # Never wait past the run's deadline
+    timeout = budget_timeout(TOOL_CALL_TIMEOUT)
 
     try:
-        last_message = state["messages"][-1]
-        if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
-            return {"messages": result}
+        with timed(tool_latency, f"tool:{tool_name}", tool=tool_name):
+            # Get tool from our mapping
+            tool = get_tool_registry().tools_by_name.get(tool_name)
+
+            cache_key = tool_cache_key(tool_name, tool_args) if tool is not None and is_deterministic(tool) else None
+            cached = tool_result_cache.get(cache_key) if cache_key else None
+
+            if tool is None:
+                status = "not_found"
+                observation = f"Tool '{tool_name}' not found. Available tools: {list(get_tool_registry().tools_by_name.keys())}"
+            elif cached is not None:
+                status = "cached"
+                observation = cached
+            elif batch is not None:
+                # shield: one call timing out must not cancel the shared request
+                task, position = batch
+                observation = (await asyncio.wait_for(asyncio.shield(task), timeout=timeout))[position]
+            elif getattr(tool, "coroutine", None) is not None:
+                # Native async tool (e.g. MCP-backed): run on the event loop
+                observation = await asyncio.wait_for(tool.ainvoke(tool_args), timeout=timeout)
+            else:
+                # Sync tool: run in the bounded thread pool
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(_tool_executor, tool.invoke, tool_args)
+                observation = await asyncio.wait_for(future, timeout=timeout)
+
+        # MCP tools report failures as "Error..." strings; only memoize real results
+        if status == "ok" and str(observation).startswith("Error"):
+            status = "error"
+        if cache_key and status == "ok":
+            tool_result_cache.set(cache_key, observation)
+
+        return ToolMessage(content=str(observation), tool_call_id=tool_call["id"])
+    except asyncio.TimeoutError:
+        status = "timeout"
+        return ToolMessage(
+            content=f"Error executing tool: '{tool_name}' timed out after {timeout:.3g}s",
+            tool_call_id=tool_call["id"]
+        )
+    except Exception as e:
+        status = "error"
+        return ToolMessage(content=f"Error executing tool: {str(e)}", tool_call_id=tool_call["id"])
+    finally:
+        tool_calls.inc(tool=tool_name, status=status)
+
 
-        for tool_call in last_message.tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
+def _start_mcp_batch(tool_calls: list):
+    """
+    Send the turn's uncached MCP tool calls as one batch request.
+    Returns (task, {index in tool_calls: (task, position in batch)}); (None, {}) if fewer than two qualify.
+    """
+    tools_by_name = get_tool_registry().tools_by_name
+    indexes, calls = [], []
+    for i, tool_call in enumerate(tool_calls):
+        tool = tools_by_name.get(tool_call["name"])
+        if tool is None:
+            continue
+        call = mcp_call_args(tool, tool_call["args"])
+        if call is None:
+            continue
+        if is_deterministic(tool) and tool_cache_key(tool_call["name"], tool_call["args"]) in tool_result_cache:
+            continue
+        indexes.append(i)
+        calls.append(call)
+    if len(calls) < 2:
+        return None, {}
 
-            try:
-                # Get tool from our mapping
-                tool = _tools_by_name.get(tool_name)
+    task = asyncio.ensure_future(call_mcp_tools_batch(calls))
+    return task, {i: (task, position) for position, i in enumerate(indexes)}
 
-                if tool:
-                    # Execute the tool
-                    observation = tool.invoke(tool_args)
-                else:
-                    observation = f"Tool '{tool_name}' not found. Available tools: {list(_tools_by_name.keys())}"
 
-                result.append(ToolMessage(content=str(observation), tool_call_id=tool_call["id"]))
-            except Exception as e:
-                result.append(ToolMessage(content=f"Error executing tool: {str(e)}", tool_call_id=tool_call["id"]))
+async def atool_node(state: dict):
+    """Performs the tool calls of the turn, concurrently"""
+    batch_task = None
+    try:
+        last_message = state["messages"][-1]
+        if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
+            return {"messages": []}
 
-        return {"messages": result}
+        budget = current_budget.get()
+        if budget is not None:
+            budget.charge_tools(len(last_message.tool_calls))
+
+        # gather keeps the original tool_call order and cancels every call if the node is cancelled
+        with timed(node_latency, "tool_node", node="tool_node"):
+            batch_task, batched = _start_mcp_batch(last_message.tool_calls)
+            result = await asyncio.gather(
+                *(_run_tool_call(tool_call, batched.get(i)) for i, tool_call in enumerate(last_message.tool_calls))
+            )
+
+        return {"messages": list(result)}
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         print(f"Error in tool_node: {e}")
-        return {"messages": result}
+        return {"messages": []}
+    finally:
+        if batch_task is not None and not batch_task.done():
+            batch_task.cancel()
+
+
+def _arithmetic_input(state: dict):
+    """Return the evaluator result for a bare arithmetic prompt, else None"""
+    messages = state["messages"]
+    if len(messages) != 1 or getattr(messages[0], "type", "") != "human":
+        return None
+    content = messages[0].content
+    if not isinstance(content, str):
+        return None
+    expr = content.strip().rstrip("=").strip()
+    if not expr or not _ARITHMETIC_RE.match(expr) or not _BINARY_OP_RE.search(expr):
+        return None
+    if _DIGIT_GROUPS_RE.search(expr):
+        return None
+    result = _safe_eval_expr(expr)
+    return result if result["error"] is None else None
 
 
-def should_continue(state: MessagesState) -> Literal["tool_node", END]:
+def route_start(state: MessagesState):
+    """Send bare arithmetic straight to the evaluator; everything else goes to the LLM"""
+    if state.get("fast_path", True):
+        result = _arithmetic_input(state)
+        if result is not None:
+            # Hand the result over so the node doesn't evaluate the prompt again
+            return Send("fast_path", {**state, "arithmetic": result})
+    return "llm_call"
+
+
+def fast_path(state: dict):
+    """Answer a bare arithmetic prompt without calling the LLM"""
+    with timed(node_latency, "fast_path", node="fast_path"):
+        result = state["arithmetic"]
+    return {
+        "messages": [AIMessage(content=f"{result['expression']} = {result['result']}")],
+        "llm_calls": state.get('llm_calls', 0)
+    }
+
+
+def should_continue(state: MessagesState) -> Literal["tool_node", "budget_exhausted", END]:
     """Decide if we should continue the loop or stop based upon whether the LLM made a tool call"""
 
     messages = state["messages"]
     last_message = messages[-1]
+    budget = current_budget.get()
 
-    # If the LLM makes a tool call, then perform an action
+    # If the LLM makes a tool call, then perform an action (if the budget still allows it).
+    # Calls requested by the last model call allowed still run: after_tools then ends the
+    # run with their results instead of throwing them away.
     if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
+        if budget is not None and not budget.allows_tools(len(last_message.tool_calls)):
+            return "budget_exhausted"
         return "tool_node"
 
+    # The model call itself was cut off by the deadline (no new AI message)
+    if not isinstance(last_message, AIMessage) and budget is not None and budget.exhausted():
+        return "budget_exhausted"
+
     # Otherwise, we stop (reply to the user)
-    return END
\ No newline at end of file
+    return END
+
+
+def after_tools(state: MessagesState) -> Literal["llm_call", "budget_exhausted"]:
+    """Go back to the model unless the run's budget is used up"""
+    budget = current_budget.get()
+    if budget is not None and budget.exhausted():
+        return "budget_exhausted"
+    return "llm_call"
+
+
+# How each budget is named in the best-effort answer
+_BUDGET_LABELS = {"deadline": "time", "llm_calls": "model call", "tokens": "token", "tool_calls": "tool call"}
+
+
+def budget_exhausted(state: dict):
+    """
+    End a run whose budget ran out with a best-effort answer.
+    Pending tool calls get a "not run" result so every tool_call_id stays paired.
+    """
+    messages = state["messages"]
+    last_message = messages[-1]
+    pending = last_message.tool_calls if isinstance(last_message, AIMessage) else []
+    budget = current_budget.get()
+    reason = (budget.exhausted(len(pending)) if budget is not None else None) or "budget"
+
+    result = [
+        ToolMessage(content=f"Not run: {reason} budget exhausted", tool_call_id=call["id"])
+        for call in pending
+    ]
+
+    # Best effort: what the model last said this turn, plus the tool results it hasn't seen yet
+    turn_start = max((i for i, m in enumerate(messages) if getattr(m, "type", "") == "human"), default=-1) + 1
+    said, results, tool_names = None, [], {}
+    for m in messages[turn_start:]:
+        if isinstance(m, AIMessage):
+            tool_names.update((call["id"], call["name"]) for call in m.tool_calls)
+            if isinstance(m.content, str) and m.content.strip():
+                said, results = m.content, []
+        elif isinstance(m, ToolMessage):
+            results.append(f"{tool_names.get(m.tool_call_id, 'tool')} -> {m.content}")
+
+    answer = f"I stopped before finishing because the {_BUDGET_LABELS.get(reason, reason)} budget ran out."
+    if said:
+        answer += f" {said}"
+    if results:
+        answer += " Latest results: " + "; ".join(results[-3:])
+
+    result.append(AIMessage(content=answer))
+    return {"messages": result, "budget_exhausted": reason}
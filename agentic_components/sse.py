@@ -0,0 +1,104 @@
+"""
+SSE Encoding
+------------
+Fast encoding of agent events into Server-Sent Events.
+
+LangChain messages are encoded by typed encoders that emit only the
+fields clients use (empty fields are omitted), everything else goes
+straight to the JSON backend. orjson is used when installed, with the
+stdlib `json` module as fallback.
+"""
+
+import json
+from functools import singledispatch
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ----------------------------------------------------------------------
+# Typed encoders
+# ----------------------------------------------------------------------
+@singledispatch
+def encode_value(obj: Any) -> Any:
+    """Fallback for objects the JSON backend can't encode natively"""
+    return str(obj)
+
+
+@encode_value.register
+def _(obj: BaseModel) -> Any:
+    return obj.model_dump(mode="json")
+
+
+@encode_value.register
+def encode_message(message: BaseMessage) -> Dict[str, Any]:
+    data = {"type": message.type, "content": message.content}
+    if message.id:
+        data["id"] = message.id
+    if message.name:
+        data["name"] = message.name
+    if message.additional_kwargs:
+        data["additional_kwargs"] = message.additional_kwargs
+    if message.response_metadata:
+        data["response_metadata"] = message.response_metadata
+    return data
+
+
+@encode_value.register
+def _(message: AIMessage) -> Dict[str, Any]:
+    data = encode_message(message)
+    if message.tool_calls:
+        data["tool_calls"] = message.tool_calls
+    if message.invalid_tool_calls:
+        data["invalid_tool_calls"] = message.invalid_tool_calls
+    if message.usage_metadata:
+        data["usage_metadata"] = message.usage_metadata
+    return data
+
+
+@encode_value.register
+def _(message: ToolMessage) -> Dict[str, Any]:
+    data = encode_message(message)
+    data["tool_call_id"] = message.tool_call_id
+    if message.status != "success":
+        data["status"] = message.status
+    return data
+
+
+# ----------------------------------------------------------------------
+# JSON backend
+# ----------------------------------------------------------------------
+def _json_dumps(obj: Any) -> str:
+    return json.dumps(obj, default=encode_value, ensure_ascii=False, separators=(",", ":"))
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj: Any) -> str:
+        try:
+            return orjson.dumps(obj, default=encode_value, option=_ORJSON_OPTIONS).decode("utf-8")
+        except TypeError:
+            # e.g. integers beyond 64 bits, which orjson rejects
+            return _json_dumps(obj)
+else:
+    dumps = _json_dumps
+
+
+def format_sse(event: str, data: dict | str, event_id: Optional[str] = None) -> str:
+    """Format an event + data as a proper SSE message (with an `id:` line when given)."""
+    if not isinstance(data, str):
+        try:
+            data = dumps(data)
+        except Exception as e:
+            data = dumps({"error": f"Serialization error: {str(e)}"})
+    if event_id is not None:
+        return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+    return f"event: {event}\ndata: {data}\n\n"
+
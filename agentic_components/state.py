@@ -5,4 +5,10 @@ import operator
 
 class MessagesState(TypedDict):
     messages: Annotated[list[AnyMessage], operator.add]
-    llm_calls: int
\ No newline at end of file
+    llm_calls: int
+    # Per-request switch for the LLM-free arithmetic fast path (default on)
+    fast_path: bool
+    # Evaluator result of a bare arithmetic prompt, computed once by route_start
+    arithmetic: dict
+    # Which budget ended the run early (set by the budget_exhausted node)
+    budget_exhausted: str
@@ -0,0 +1,188 @@
+"""
+Conversation Threads
+--------------------
+Keeps multi-turn history on the server so clients only send the new
+message plus a `thread_id`. Each run appends only the messages it
+produced (a delta), never a full snapshot of the conversation.
+
+Backends:
+    - MemoryThreadStore: LRU of threads with TTL eviction (dev / tests)
+    - SQLiteThreadStore: append-only message log in a SQLite file (single node)
+
+Configure with:
+    THREAD_STORE         "memory" (default) or "sqlite"
+    THREAD_DB            SQLite path (default "threads.sqlite")
+    THREAD_TTL           seconds of inactivity before a thread is evicted (default 86400)
+    THREAD_MAX_THREADS   threads kept by the memory store (default 1000)
+    THREAD_MAX_MESSAGES  most recent messages loaded into a run (default 200)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+THREAD_STORE = os.getenv("THREAD_STORE", "memory").lower()
+THREAD_DB = os.getenv("THREAD_DB", "threads.sqlite")
+THREAD_TTL = float(os.getenv("THREAD_TTL", "86400"))
+THREAD_MAX_THREADS = int(os.getenv("THREAD_MAX_THREADS", "1000"))
+THREAD_MAX_MESSAGES = int(os.getenv("THREAD_MAX_MESSAGES", "200"))
+
+
+def trim_history(messages: List[BaseMessage], max_messages: int) -> List[BaseMessage]:
+    """Keep at most `max_messages`, starting on a human turn so tool calls stay paired"""
+    if len(messages) <= max_messages:
+        return messages
+    tail = messages[-max_messages:]
+    for i, message in enumerate(tail):
+        if message.type == "human":
+            return tail[i:]
+    return []
+
+
+class ThreadStore(ABC):
+    """Base class: per-thread locking plus the load/append interface."""
+
+    def __init__(self, ttl: float = THREAD_TTL, max_messages: int = THREAD_MAX_MESSAGES):
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def lock(self, thread_id: str) -> asyncio.Lock:
+        """Lock that serializes runs on the same thread"""
+        lock = self._locks.get(thread_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[thread_id] = lock
+        return lock
+
+    @abstractmethod
+    async def load(self, thread_id: str) -> List[BaseMessage]:
+        """Recent history of a thread (at most `max_messages`), [] if unknown or expired"""
+
+    @abstractmethod
+    async def append(self, thread_id: str, messages: List[BaseMessage]):
+        """Add the messages a run produced to the thread"""
+
+
+class MemoryThreadStore(ThreadStore):
+    """In-process LRU of threads; idle threads expire after `ttl` seconds."""
+
+    def __init__(self, max_threads: int = THREAD_MAX_THREADS, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        # thread_id -> (last_access, [message dicts])
+        self._threads: "OrderedDict[str, tuple[float, list]]" = OrderedDict()
+
+    def _evict(self, now: float):
+        while self._threads:
+            thread_id, (last_access, _) = next(iter(self._threads.items()))
+            if len(self._threads) > self.max_threads or now - last_access > self.ttl:
+                del self._threads[thread_id]
+            else:
+                break
+
+    async def load(self, thread_id: str) -> List[BaseMessage]:
+        now = time.monotonic()
+        self._evict(now)
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            return []
+        self._threads[thread_id] = (now, entry[1])
+        self._threads.move_to_end(thread_id)
+        return trim_history(messages_from_dict(entry[1]), self.max_messages)
+
+    async def append(self, thread_id: str, messages: List[BaseMessage]):
+        now = time.monotonic()
+        _, stored = self._threads.get(thread_id, (now, []))
+        stored.extend(message_to_dict(m) for m in messages)
+        # Bound memory: drop what load() would never return anyway
+        if len(stored) > 2 * self.max_messages:
+            stored[:] = [message_to_dict(m) for m in trim_history(messages_from_dict(stored), self.max_messages)]
+        self._threads[thread_id] = (now, stored)
+        self._threads.move_to_end(thread_id)
+        self._evict(now)
+
+
+class SQLiteThreadStore(ThreadStore):
+    """Append-only message log per thread in a SQLite file."""
+
+    def __init__(self, path: str = THREAD_DB, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS thread_messages (
+                thread_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                PRIMARY KEY (thread_id, seq)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _evict(self, now: float):
+        expired = [row[0] for row in self._conn.execute(
+            "SELECT thread_id FROM threads WHERE updated_at < ?", (now - self.ttl,)
+        )]
+        for thread_id in expired:
+            self._conn.execute("DELETE FROM thread_messages WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+    def _load(self, thread_id: str) -> List[BaseMessage]:
+        with self._db_lock:
+            row = self._conn.execute("SELECT updated_at FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+            if row is None or time.time() - row[0] > self.ttl:
+                return []
+            # Read only the tail (one extra row tells trim_history it was cut)
+            rows = self._conn.execute(
+                "SELECT message FROM thread_messages WHERE thread_id = ? ORDER BY seq DESC LIMIT ?",
+                (thread_id, self.max_messages + 1),
+            ).fetchall()
+        return trim_history(messages_from_dict([json.loads(r[0]) for r in reversed(rows)]), self.max_messages)
+
+    def _append(self, thread_id: str, messages: List[BaseMessage]):
+        now = time.time()
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) FROM thread_messages WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+            seq = row[0] + 1
+            self._conn.executemany(
+                "INSERT INTO thread_messages (thread_id, seq, message) VALUES (?, ?, ?)",
+                [(thread_id, seq + i, json.dumps(message_to_dict(m), default=str)) for i, m in enumerate(messages)],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO threads (thread_id, updated_at) VALUES (?, ?)", (thread_id, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    async def load(self, thread_id: str) -> List[BaseMessage]:
+        return await asyncio.to_thread(self._load, thread_id)
+
+    async def append(self, thread_id: str, messages: List[BaseMessage]):
+        await asyncio.to_thread(self._append, thread_id, messages)
+
+
+def create_thread_store() -> ThreadStore:
+    """Build the store selected by THREAD_STORE"""
+    if THREAD_STORE == "sqlite":
+        return SQLiteThreadStore()
+    return MemoryThreadStore()
+
+
+thread_store = create_thread_store()
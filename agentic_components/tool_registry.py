@@ -0,0 +1,116 @@
+"""
+Tool Registry
+-------------
+Keeps the set of tools bound to the model: the built-in tools plus the
+tools discovered from the MCP server. Discovery results are cached with a
+TTL (and the server's ETag, when it sends one) and refreshed in the
+background, so requests never wait on a `/tools/list` round trip. The
+model is re-bound only when the discovered tool set actually changes.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from agentic_components.cache import stable_hash
+from agentic_components.mcp_tools import fetch_mcp_tool_defs, make_mcp_tool
+
+# Set to "false" to bind only the built-in tools
+MCP_TOOLS_ENABLED = os.getenv("MCP_TOOLS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds before cached MCP tool schemas are considered stale
+MCP_TOOLS_TTL = float(os.getenv("MCP_TOOLS_TTL", "300"))
+
+
+class ToolRegistry:
+    """Cached tool set and the model bound to it."""
+
+    def __init__(self, base_model, builtin_tools: List[Any], ttl: float = MCP_TOOLS_TTL, enabled: bool = MCP_TOOLS_ENABLED):
+        self.base_model = base_model
+        self.builtin_tools = list(builtin_tools)
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self.tools: List[Any] = []
+        self.tools_by_name: Dict[str, Any] = {}
+        self.model = None
+        self.version = 0
+        # Hash of the bound tool schemas (part of the LLM response cache key)
+        self.tools_signature = ""
+
+        self._signature: Optional[str] = None
+        self._etag: Optional[str] = None
+        self._fetched_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        self._bind([])
+
+    def _bind(self, mcp_tools: List[Any]):
+        """Rebuild the tool set and re-bind the model"""
+        builtin_names = {tool.name for tool in self.builtin_tools}
+        # Built-in tools run in-process, so they win over MCP tools of the same name
+        tools = self.builtin_tools + [tool for tool in mcp_tools if tool.name not in builtin_names]
+
+        self.tools = tools
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.model = self.base_model.bind_tools(tools)
+        self.tools_signature = stable_hash([convert_to_openai_tool(tool) for tool in tools])
+        self.version += 1
+
+    @staticmethod
+    def _signature_of(tool_defs: List[Dict[str, Any]]) -> str:
+        canonical = json.dumps(sorted(tool_defs, key=lambda d: d.get("name", "")), sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() - self._fetched_at > self.ttl
+
+    async def refresh(self) -> bool:
+        """
+        Re-discover MCP tools now.
+
+        Returns True if the tool set changed and the model was re-bound.
+        On failure the previous tool set is kept.
+        """
+        if not self.enabled:
+            return False
+
+        try:
+            tool_defs, etag = await fetch_mcp_tool_defs(self._etag)
+        except Exception as e:
+            print(f"Warning: Could not refresh tools from MCP: {e}")
+            # Back off for a full TTL instead of retrying on every request
+            self._fetched_at = time.monotonic()
+            return False
+
+        self._fetched_at = time.monotonic()
+        self._etag = etag
+        if tool_defs is None:
+            # 304 Not Modified
+            return False
+
+        signature = self._signature_of(tool_defs)
+        if signature == self._signature:
+            return False
+
+        self._bind([make_mcp_tool(tool_def) for tool_def in tool_defs])
+        self._signature = signature
+        print(f"🔧 Bound {len(self.tools)} tools (MCP tool set v{self.version})")
+        return True
+
+    def maybe_refresh(self):
+        """Schedule a background refresh if the cache is stale; never blocks"""
+        if not self.enabled or not self.is_stale:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        try:
+            self._refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+        except RuntimeError:
+            # No running loop (sync caller); the next async caller will refresh
+            pass
@@ -2,23 +2,121 @@
 Generic Tools for Conversational Handling
 ----------------------------------------
 Includes a single tool for greeting detection and response.
+
+Greetings are detected with a word-boundary regex compiled once at
+registration ("hi" no longer matches inside "this"). Replies come from the
+LLM, through a chain cached per (API key, model), or, with
+GREETING_RESPONSE_MODE=template, from a pool of canned replies; the LLM is
+then only called for messages that are more than a bare greeting.
 """
 
+import hashlib
 import json
 import os
-from typing import Optional
+import random
+import re
+from typing import Dict, List, Optional
 from fastmcp import FastMCP
-from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
 from  dotenv import load_dotenv
+
+from agentic_components.cache import LRUCache
+
 load_dotenv()
 
+# "llm" (default): every greeting is answered by the model
+# "template": bare greetings are answered from GREETING_TEMPLATES, others by the model
+GREETING_RESPONSE_MODE = os.getenv("GREETING_RESPONSE_MODE", "llm").lower()
+# Optional JSON file: {"hello": ["Hello{name}! ...", ...], "default": [...]}
+GREETING_TEMPLATES_FILE = os.getenv("GREETING_TEMPLATES")
+# Words besides the greeting a message may have and still get a template ("hi there")
+GREETING_TEMPLATE_MAX_EXTRA_WORDS = int(os.getenv("GREETING_TEMPLATE_MAX_EXTRA_WORDS", "2"))
+# Cached chains (one client each), keyed by API key hash and model
+GREETING_CLIENT_CACHE_SIZE = int(os.getenv("GREETING_CLIENT_CACHE_SIZE", "32"))
+
+GREETINGS = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening", "yo", "what’s up"]
+
+DEFAULT_TEMPLATES: Dict[str, List[str]] = {
+    "good morning": ["Good morning{name}! How can I help you today?"],
+    "good afternoon": ["Good afternoon{name}! What can I do for you?"],
+    "good evening": ["Good evening{name}! How can I help?"],
+    "what’s up": ["Not much{name}, just ready to help. What do you need?"],
+    "default": [
+        "Hello{name}! How can I help you today?",
+        "Hi{name}! What can I do for you?",
+        "Hey{name}, good to see you! What do you need?",
+    ],
+}
+
+_greeting_chains = LRUCache(maxsize=GREETING_CLIENT_CACHE_SIZE)
+
+
+def compile_greeting_matcher(greetings: List[str]) -> "re.Pattern":
+    """One alternation with word boundaries; longer phrases first so they win over their prefixes."""
+    alternatives = []
+    for greeting in sorted(greetings, key=len, reverse=True):
+        # Accept both the typographic and the ASCII apostrophe
+        alternatives.append(r"\s+".join(re.escape(word) for word in greeting.split()).replace("’", "['’]"))
+    return re.compile(r"\b(" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+
+def load_templates(path: Optional[str] = GREETING_TEMPLATES_FILE) -> Dict[str, List[str]]:
+    if not path:
+        return DEFAULT_TEMPLATES
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def template_reply(matcher: "re.Pattern", templates: Dict[str, List[str]], text: str, user_name: Optional[str]) -> Optional[str]:
+    """Canned reply for a bare greeting, or None if the message needs the model"""
+    match = matcher.search(text)
+    if match is None:
+        return None
+    rest = re.findall(r"\w+", text[:match.start()] + " " + text[match.end():])
+    if user_name:
+        name_words = {w.lower() for w in user_name.split()}
+        rest = [w for w in rest if w.lower() not in name_words]
+    if len(rest) > GREETING_TEMPLATE_MAX_EXTRA_WORDS:
+        return None
+
+    key = re.sub(r"\s+", " ", match.group(1).lower()).replace("'", "’")
+    pool = templates.get(key) or templates.get("default")
+    if not pool:
+        return None
+    return random.choice(pool).format(name=f" {user_name}" if user_name else "")
+
+
+def _greeting_chain(openai_api_key: str, model: Optional[str]):
+    """Prompt | ChatOpenAI | parser, built once per API key and model"""
+    key = (hashlib.sha256(openai_api_key.encode("utf-8")).hexdigest(), model)
+    chain = _greeting_chains.get(key)
+    if chain is None:
+        # Imported on first greeting so loading this module (and the MCP server) stays fast
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_openai import ChatOpenAI
+
+        llm = ChatOpenAI(model=model, temperature=0.6, api_key=openai_api_key)
+        prompt = ChatPromptTemplate.from_messages([
+            (
+                "system",
+                "You are a friendly AI assistant that replies to greetings warmly and naturally."
+            ),
+            (
+                "user",
+                "User{user} said: '{text}'. Reply naturally and kindly in one short sentence."
+            ),
+        ])
+        chain = prompt | llm | StrOutputParser()
+        _greeting_chains.set(key, chain)
+    return chain
 
 
 def register_tools(mcp: FastMCP):
     """Register general-purpose conversational tools."""
 
+    matcher = compile_greeting_matcher(GREETINGS)
+    templates = load_templates() if GREETING_RESPONSE_MODE == "template" else None
+
     # ----------------------------------------------------------------------
     # GREETING HANDLER TOOL
     # ----------------------------------------------------------------------
@@ -32,31 +130,20 @@ def register_tools(mcp: FastMCP):
         Detects if the user message is a greeting (like 'hi', 'hello', 'good morning')
         and returns a friendly, human-like response.
         """
-        greetings = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening", "yo", "what’s up"]
-        lower_text = text.lower().strip()
-
-        OPENAI_MODEL = os.getenv("OPENAI_MODEL")
-
         # --- Greeting Detection ---
-        if not any(word in lower_text for word in greetings):
+        if not matcher.search(text):
             return "No greeting detected."
 
+        # --- Canned reply for bare greetings ---
+        if templates is not None:
+            reply = template_reply(matcher, templates, text, user_name)
+            if reply is not None:
+                return reply
+
         # --- Generate Natural Response ---
         try:
-            llm = ChatOpenAI(model=OPENAI_MODEL, temperature=0.6, api_key=openai_api_key)
-            prompt = ChatPromptTemplate.from_messages([
-                (
-                    "system",
-                    "You are a friendly AI assistant that replies to greetings warmly and naturally."
-                ),
-                (
-                    "user",
-                    f"User{' ' + user_name if user_name else ''} said: '{text}'. Reply naturally and kindly in one short sentence."
-                ),
-            ])
-
-            chain = prompt | llm | StrOutputParser()
-            result = await chain.ainvoke({})
+            chain = _greeting_chain(openai_api_key, os.getenv("OPENAI_MODEL"))
+            result = await chain.ainvoke({"user": f" {user_name}" if user_name else "", "text": text.strip()})
             return result.strip()
 
         except Exception as e:
@@ -2,6 +2,26 @@
 import json
 import ast
 import operator as op
+from functools import lru_cache
+
+from agentic_components.cpu_pool import CPUPoolError, cpu_pool
+
+# numpy is imported on the first batch evaluation (see _load_numpy), not at import time
+np = None
+_numpy_checked = False
+
+
+def _load_numpy():
+    """Import numpy once; None if unavailable (calculate_batch falls back to a scalar loop)"""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
 
 # ---------- Safe math expression evaluator ----------
 _ALLOWED_OPS = {
@@ -16,30 +36,169 @@ _ALLOWED_OPS = {
     ast.USub: op.neg,
 }
 
-def _eval_node(node):
-    if isinstance(node, ast.Num):  # Py<3.8
-        return node.n
-    if isinstance(node, ast.Constant):  # Py>=3.8
-        if isinstance(node.value, (int, float)):
-            return node.value
-        raise ValueError("Only numeric constants are allowed.")
-    if isinstance(node, ast.UnaryOp) and type(node.op) in _ALLOWED_OPS:
-        return _ALLOWED_OPS[type(node.op)](_eval_node(node.operand))
-    if isinstance(node, ast.BinOp) and type(node.op) in _ALLOWED_OPS:
-        left = _eval_node(node.left)
-        right = _eval_node(node.right)
-        return _ALLOWED_OPS[type(node.op)](left, right)
-    if isinstance(node, ast.Expr):
-        return _eval_node(node.value)
-    raise ValueError("Unsupported expression syntax.")
-
-def _safe_eval_expr(expr: str):
+# Guards so a single expression cannot pin a worker
+MAX_EXPR_LENGTH = 1000       # characters
+MAX_EXPR_DEPTH = 50          # AST nesting
+MAX_EXPONENT = 10_000        # |b| in a ** b
+MAX_INT_BITS = 16_384        # size of any integer operand or result
+EXPR_CACHE_SIZE = 1024       # compiled expressions kept in the LRU
+
+# Left-associative operators of equal precedence: `1+2-3+...` is a flat chain, not nesting
+_PRECEDENCE = {
+    ast.Add: 1, ast.Sub: 1,
+    ast.Mult: 2, ast.Div: 2, ast.FloorDiv: 2, ast.Mod: 2,
+}
+
+# Instruction opcodes of a compiled expression (postfix order)
+_CONST, _VAR, _UNARY, _BINARY = range(4)
+
+
+@lru_cache(maxsize=EXPR_CACHE_SIZE)
+def _compile_expr(expr: str) -> tuple:
+    """
+    Parse and validate an expression once into a flat postfix program.
+
+    Returns a tuple of (opcode, arg) instructions. Cached by expression
+    text, so repeated expressions skip parsing entirely.
+    """
+    if len(expr) > MAX_EXPR_LENGTH:
+        raise ValueError(f"Expression longer than {MAX_EXPR_LENGTH} characters.")
+
+    tree = ast.parse(expr, mode="eval")
+    program = []
+    # Iterative post-order walk: (node, depth, children_done)
+    stack = [(tree.body, 1, False)]
+    while stack:
+        node, depth, done = stack.pop()
+        if depth > MAX_EXPR_DEPTH:
+            raise ValueError(f"Expression nested deeper than {MAX_EXPR_DEPTH}.")
+
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError("Only numeric constants are allowed.")
+            program.append((_CONST, node.value))
+        elif isinstance(node, ast.Name):
+            program.append((_VAR, node.id))
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in _ALLOWED_OPS:
+            if done:
+                program.append((_UNARY, type(node.op)))
+            else:
+                stack.append((node, depth, True))
+                stack.append((node.operand, depth + 1, False))
+        elif isinstance(node, ast.BinOp) and type(node.op) in _ALLOWED_OPS:
+            if done:
+                program.append((_BINARY, type(node.op)))
+            else:
+                stack.append((node, depth, True))
+                # A left operand continuing the same chain is not nested; the length guard caps chains
+                level = _PRECEDENCE.get(type(node.op))
+                same_chain = (
+                    level is not None
+                    and isinstance(node.left, ast.BinOp)
+                    and _PRECEDENCE.get(type(node.left.op)) == level
+                )
+                # Right is pushed first so left is evaluated first
+                stack.append((node.right, depth + 1, False))
+                stack.append((node.left, depth if same_chain else depth + 1, False))
+        else:
+            raise ValueError("Unsupported expression syntax.")
+
+    return tuple(program)
+
+
+def _bits(value) -> int:
+    return value.bit_length() if isinstance(value, int) else 0
+
+
+def _check_binary(op_type, left, right):
+    """Reject operations whose integer result would be unreasonably large"""
+    if op_type is ast.Pow:
+        if np is not None and isinstance(right, np.ndarray):
+            exponent = np.max(np.abs(right)) if right.size else 0
+        else:
+            exponent = abs(right)
+        if exponent > MAX_EXPONENT:
+            raise ValueError(f"Exponent larger than {MAX_EXPONENT} is not allowed.")
+        if isinstance(left, int) and isinstance(right, int) and right > 0:
+            # |left| < 2**bits, so |left**right| < 2**((bits - 1) * right + 1)
+            if (_bits(left) - 1) * right + 1 > MAX_INT_BITS:
+                raise ValueError(f"Result would exceed {MAX_INT_BITS} bits.")
+    elif op_type is ast.Mult:
+        if _bits(left) + _bits(right) > MAX_INT_BITS:
+            raise ValueError(f"Result would exceed {MAX_INT_BITS} bits.")
+
+
+def _run_program(program: tuple, variables: dict | None = None):
+    """Evaluate a compiled program with an explicit stack (no recursion)"""
+    stack = []
+    for opcode, arg in program:
+        if opcode == _CONST:
+            stack.append(arg)
+        elif opcode == _VAR:
+            if not variables or arg not in variables:
+                raise ValueError(f"Unknown variable: {arg}")
+            stack.append(variables[arg])
+        elif opcode == _UNARY:
+            stack.append(_ALLOWED_OPS[arg](stack.pop()))
+        else:
+            right = stack.pop()
+            left = stack.pop()
+            _check_binary(arg, left, right)
+            value = _ALLOWED_OPS[arg](left, right)
+            if isinstance(value, complex):
+                # e.g. (-8) ** 0.5; not JSON-serializable and not a real answer
+                raise ValueError("Result is not a real number.")
+            stack.append(value)
+
+    result = stack.pop()
+    if isinstance(result, int) and _bits(result) > MAX_INT_BITS:
+        raise ValueError(f"Result would exceed {MAX_INT_BITS} bits.")
+    return result
+
+
+def _safe_eval_expr(expr: str, variables: dict | None = None):
     try:
-        tree = ast.parse(expr, mode="eval")
-        return {"expression": expr, "result": _eval_node(tree.body), "error": None}
+        return {"expression": expr, "result": _run_program(_compile_expr(expr), variables), "error": None}
     except Exception as e:
         return {"expression": expr, "result": None, "error": str(e)}
 
+
+def _safe_eval_batch(expression: str, variables: dict) -> dict:
+    """
+    Evaluate one expression over arrays of variable bindings.
+
+    `variables` maps each name to a list of values; all lists must have
+    the same length. Uses NumPy vectorization when available.
+    """
+    try:
+        program = _compile_expr(expression)
+        lengths = {len(values) for values in variables.values()}
+        if len(lengths) > 1:
+            raise ValueError("All variable arrays must have the same length.")
+        count = lengths.pop() if lengths else 1
+
+        if count == 0:
+            results = []
+        elif _load_numpy() is not None:
+            arrays = {name: np.asarray(values, dtype=float) for name, values in variables.items()}
+            with np.errstate(divide="raise", over="raise", invalid="raise"):
+                result = _run_program(program, arrays)
+            results = np.broadcast_to(result, (count,)).tolist()
+        else:
+            results = [
+                _run_program(program, {name: values[i] for name, values in variables.items()})
+                for i in range(count)
+            ]
+        return {"expression": expression, "results": results, "error": None}
+    except FloatingPointError as e:
+        return {"expression": expression, "results": None, "error": f"Numeric error: {e}"}
+    except Exception as e:
+        return {"expression": expression, "results": None, "error": str(e)}
+
+
+def _safe_eval_many(expressions: list[str]) -> list[dict]:
+    return [_safe_eval_expr(expr) for expr in expressions]
+
 # ---------- Registrar ----------
 def register_tools(mcp):
     """
@@ -49,36 +208,71 @@ def register_tools(mcp):
         from math_tools import register_math_tools
         mcp = FastMCP("Math MCP Server")
         register_math_tools(mcp)
+
+    All tools here are pure, so they are registered with
+    meta={"deterministic": True} and clients may memoize their results.
+    Expression evaluation awaits cpu_pool.run, so it runs in the worker
+    processes of agentic_components/cpu_pool.py; the arithmetic tools are
+    cheap and stay inline.
     """
+    # Spawn the workers now, so the first calculation doesn't wait for them
+    cpu_pool.start()
 
-    @mcp.tool
+    @mcp.tool(meta={"deterministic": True})
     def add(a: float, b: float):
         """Add two numbers and return the sum."""
         return a + b
 
-    @mcp.tool
+    @mcp.tool(meta={"deterministic": True})
     def subtract(a: float, b: float):
         """Subtract b from a and return the difference."""
         return a - b
 
-    @mcp.tool
+    @mcp.tool(meta={"deterministic": True})
     def multiply(a: float, b: float):
         """Multiply two numbers and return the product."""
         return a * b
 
-    @mcp.tool
+    @mcp.tool(meta={"deterministic": True})
     def divide(a: float, b: float):
         """Divide a by b and return the quotient. Raises on division by zero."""
         if b == 0:
             raise ValueError("Division by zero is not allowed.")
         return a / b
 
-    @mcp.tool
-    def calculate(expression: str) -> str:
+    @mcp.tool(meta={"deterministic": True})
+    async def calculate(expression: str) -> str:
         """
         Safely evaluate a math expression.
         Supported: +, -, *, /, //, %, **, parentheses, ints/floats, unary +/-.
+        Exponents and integer sizes are capped to keep evaluation bounded.
         Returns a JSON string with expression, result, and error (if any).
         """
-        result = _safe_eval_expr(expression)
+        try:
+            result = await cpu_pool.run(_safe_eval_expr, expression)
+        except CPUPoolError as e:
+            result = {"expression": expression, "result": None, "error": str(e)}
         return json.dumps(result)
+
+    @mcp.tool(meta={"deterministic": True})
+    async def calculate_batch(
+        expressions: list[str] | None = None,
+        expression: str | None = None,
+        variables: dict[str, list[float]] | None = None,
+    ) -> str:
+        """
+        Evaluate many math expressions in one call.
+        Either pass `expressions` (a list of expressions, evaluated independently),
+        or pass one `expression` using variable names plus `variables`, a mapping of
+        each name to a list of values, to evaluate it for every binding.
+        Returns a JSON string: a list of results for `expressions`, or an object with
+        expression, results and error for `expression` + `variables`.
+        """
+        try:
+            if expression is not None:
+                return json.dumps(await cpu_pool.run(_safe_eval_batch, expression, variables or {}))
+            return json.dumps(await cpu_pool.run(_safe_eval_many, expressions or []))
+        except CPUPoolError as e:
+            if expression is not None:
+                return json.dumps({"expression": expression, "results": None, "error": str(e)})
+            return json.dumps([{"expression": expr, "result": None, "error": str(e)} for expr in expressions or []])
@@ -6,67 +6,182 @@ Run with:
 """
 
 import asyncio
-import json
 import os
+import time
+from contextlib import asynccontextmanager
 from pprint import pprint
 
 import uvicorn
 from fastapi import FastAPI, Request, HTTPException, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 from typing import List, Optional
 
-from agentic_components.agent import run_agent
+from agentic_components.admission import AdmissionRejected, admission_stats, client_limiter, run_gate
+from agentic_components.agent import run_agent, STREAM_MODES
+from agentic_components.budget import Budget
+from agentic_components.cache import tool_result_cache
+from agentic_components.llm_cache import llm_response_cache
+from agentic_components.coalescing import coalescer
+from agentic_components.event_log import SSE_RESUME_ENABLED, EventsExpired, event_log, parse_event_id, sse_resumes
+from agentic_components.metrics import CONTENT_TYPE, Trace, registry, sse_bytes, start_trace
+from agentic_components.sse import dumps, format_sse
+from agentic_components.graph import get_agent
+from agentic_components.llm import get_tool_registry
+from agentic_components.mcp_tools import mcp_client
 
-app = FastAPI(title="LangGraph MCP Agent (SSE API)")
+# Build the model and graph, discover MCP tools and pre-open MCP connections at
+# startup. With "false" the worker is ready sooner and all of that happens on
+# the first request (MCP tools are then discovered in the background).
+APP_WARMUP = os.getenv("APP_WARMUP", "true").lower() in ("1", "true", "yes")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled MCP client (and warm up, see APP_WARMUP) on startup; close on shutdown."""
+    await mcp_client.start()
+    if APP_WARMUP:
+        get_agent()
+        await get_tool_registry().refresh()
+        await mcp_client.warm_up()
+    try:
+        yield
+    finally:
+        await mcp_client.aclose()
+
+
+app = FastAPI(title="LangGraph MCP Agent (SSE API)", lifespan=lifespan)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(req: Request, exc: AdmissionRejected):
+    """Shed load with 429 and a Retry-After hint."""
+    return JSONResponse(
+        status_code=429,
+        content={"error": "overloaded", "detail": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def client_id(req: Request) -> str:
+    """Identify the caller for per-client rate limits."""
+    return req.headers.get("X-Client-ID") or (req.client.host if req.client else "unknown")
+
+
+def queue_deadline(data: dict) -> Optional[float]:
+    """Optional 'max_queue_wait' (seconds) from the body as a monotonic deadline; 400 on invalid values."""
+    max_wait = data.get('max_queue_wait')
+    if max_wait is None:
+        return None
+    if isinstance(max_wait, bool) or not isinstance(max_wait, (int, float)) or not max_wait >= 0:
+        raise HTTPException(status_code=400, detail="'max_queue_wait' must be a non-negative number")
+    return time.monotonic() + max_wait
 
 # ======================================================
-# 🔸 Helper: SSE Event Formatter
+# 🔸 Bounded Event Stream
 # ======================================================
-def serialize_obj(obj):
-    """Serialize complex objects to JSON-friendly format"""
-    if hasattr(obj, '__dict__'):
-        return {k: serialize_obj(v) for k, v in obj.__dict__.items()}
-    elif isinstance(obj, (list, tuple)):
-        return [serialize_obj(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {k: serialize_obj(v) for k, v in obj.items()}
-    elif hasattr(obj, '__str__'):
-        try:
-            return str(obj)
-        except:
-            return repr(obj)
-    return obj
-
-def format_sse(event: str, data: dict | str) -> str:
-    """Format an event + data as a proper SSE message."""
-    if not isinstance(data, str):
-        try:
-            # Try to serialize complex objects
-            data_clean = serialize_obj(data)
-            data = json.dumps(data_clean, ensure_ascii=False, default=str)
-        except Exception as e:
-            data = json.dumps({"error": f"Serialization error: {str(e)}"}, ensure_ascii=False)
-    return f"event: {event}\ndata: {data}\n\n"
+# Max events buffered per stream, what to do when it is full, and heartbeat period
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "256"))
+SSE_OVERFLOW_POLICY = os.getenv("SSE_OVERFLOW_POLICY", "block")  # block | drop_oldest | drop_newest
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+
+_DONE = "[DONE]"
+_HEARTBEAT = ": keep-alive\n\n"
+
+
+class SSEStream:
+    """
+    Bounded buffer between one agent run and its SSE response.
+
+    Overflow policies:
+        block        producer waits for the client (backpressure on the graph)
+        drop_oldest  discard the oldest buffered event
+        drop_newest  discard the event being sent
+    The end-of-stream marker is never dropped.
+    """
+
+    def __init__(self, maxsize: int = SSE_QUEUE_SIZE, policy: str = SSE_OVERFLOW_POLICY):
+        if policy not in ("block", "drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown SSE overflow policy: {policy}")
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.policy = policy
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def _put_evicting(self, item):
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+                self.dropped += 1
+
+    async def send(self, event: str, payload: dict):
+        """Push an SSE event, applying the overflow policy."""
+        item = (event, payload)
+        if self.policy == "block":
+            await self.queue.put(item)
+        elif self.policy == "drop_oldest":
+            self._put_evicting(item)
+        else:
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    def close(self):
+        """Mark the end of the stream without ever blocking."""
+        self._put_evicting(_DONE)
+
+    def heartbeat(self):
+        """Queue a keep-alive unless events are already waiting."""
+        if self.queue.empty():
+            try:
+                self.queue.put_nowait(_HEARTBEAT)
+            except asyncio.QueueFull:
+                pass
+
+    def cancel(self):
+        """Stop the agent run; cancellation reaches in-flight LLM, tool and HTTP calls."""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+
+async def _heartbeat(stream: SSEStream, req: Optional[Request], interval: float):
+    """Send keep-alives on a timer and cancel the run once the client is gone."""
+    while True:
+        await asyncio.sleep(interval)
+        if req is not None and await req.is_disconnected():
+            stream.cancel()
+            return
+        stream.heartbeat()
 
 
 # ======================================================
 # 🔸 Event Generator for StreamingResponse
 # ======================================================
-async def event_generator(queue: asyncio.Queue):
-    """Continuously stream messages from the async queue."""
+async def event_generator(
+    stream: SSEStream,
+    req: Optional[Request] = None,
+    heartbeat_interval: float = SSE_HEARTBEAT_INTERVAL,
+):
+    """Stream events from the run's buffer until it is done or the client leaves."""
+    heartbeat_task = asyncio.create_task(_heartbeat(stream, req, heartbeat_interval))
     try:
         while True:
-            try:
-                msg = await asyncio.wait_for(queue.get(), timeout=1.0)
-            except asyncio.TimeoutError:
-                # Send a keep-alive comment if queue is empty
-                yield ": keep-alive\n\n"
+            msg = await stream.queue.get()
+
+            if msg is _HEARTBEAT:
+                yield msg
                 continue
 
-            if msg == "[DONE]":
+            if msg == _DONE:
                 # Final completion event
-                yield format_sse("meta", {"usage": {}, "info": "stream_complete"})
+                info = {"usage": {}, "info": "stream_complete"}
+                if stream.dropped:
+                    info["dropped_events"] = stream.dropped
+                yield format_sse("meta", info)
                 break
 
             if isinstance(msg, tuple) and len(msg) == 2:
@@ -76,33 +191,283 @@ async def event_generator(queue: asyncio.Queue):
                 # Fallback if something unstructured appears
                 yield format_sse("thinking", {"content": str(msg)})
     finally:
-        pass
+        # Runs on completion and when the response is cancelled by a disconnect
+        heartbeat_task.cancel()
+        stream.cancel()
 
 
 # ======================================================
 # 🔸 Main Endpoint
 # ======================================================
+def request_budget(data: dict) -> Budget:
+    """Budget from the body's optional 'budget' object; 400 on invalid values."""
+    try:
+        return Budget.from_request(data.get('budget'))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid 'budget': {e}")
+
+
+async def orchestrate(data: dict, stream: str, sse_send, trace: Optional[Trace] = None):
+    """Run the LangGraph agent (it will emit thinking/tool/token/etc.)."""
+    # Spans from every node/tool of this run land in this trace
+    if trace is None:
+        trace = start_trace()
+    try:
+        await run_agent(
+            data['message'],
+            sse_send,
+            fast_path=data.get('fast_path', True),
+            thread_id=data.get('thread_id'),
+            stream=stream,
+            # The wall-clock budget starts when the run does, after any queueing
+            budget=request_budget(data),
+        )
+    except Exception as e:
+        await sse_send("meta", {"error": str(e)})
+    if data.get('trace'):
+        await sse_send("meta", {"trace": trace.to_dict()})
+
+
+async def count_bytes(body, endpoint: str):
+    """Pass a streaming body through while counting bytes sent."""
+    async for chunk in body:
+        sse_bytes.inc(len(chunk.encode("utf-8")), endpoint=endpoint)
+        yield chunk
+
+
+async def _attached(log, body):
+    """Count a coalesced subscriber as a reader of the run's log (for the reconnect grace)"""
+    log.attach()
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        log.detach()
+
+
+def _coalesced_response(shared) -> StreamingResponse:
+    body = shared.subscribe(_HEARTBEAT, SSE_HEARTBEAT_INTERVAL)
+    headers = None
+    if shared.log is not None:
+        body = _attached(shared.log, body)
+        headers = {"X-Run-ID": shared.log.run_id}
+    return StreamingResponse(count_bytes(body, "/run_agent"), media_type="text/event-stream", headers=headers)
+
+
+async def resume_response(run_id: str, after: int, endpoint: str) -> StreamingResponse:
+    """Replay a run's events after seq `after`, then follow it live; 404/410 if that's not possible."""
+    try:
+        body = await event_log.follow(run_id, after, _HEARTBEAT, SSE_HEARTBEAT_INTERVAL)
+    except EventsExpired:
+        sse_resumes.inc(status="expired")
+        raise HTTPException(status_code=410, detail=f"Events after {run_id}:{after} are no longer available")
+    except LookupError:
+        sse_resumes.inc(status="not_found")
+        raise HTTPException(status_code=404, detail=f"Unknown or expired run '{run_id}'")
+    sse_resumes.inc(status="ok")
+    return StreamingResponse(count_bytes(body, endpoint), media_type="text/event-stream", headers={"X-Run-ID": run_id})
+
+
 @app.post("/run_agent")
 async def run_agent_api(req: Request):
 
+    # Reconnect of a stream client: continue the run, don't start a new one
+    last_event_id = req.headers.get("Last-Event-ID")
+    if SSE_RESUME_ENABLED and last_event_id:
+        try:
+            run_id, after = parse_event_id(last_event_id)
+        except ValueError:
+            run_id = None
+        if run_id is None:
+            raise HTTPException(status_code=400, detail="'Last-Event-ID' must be '<run_id>:<seq>'")
+        return await resume_response(run_id, after, "/run_agent")
+
     data = await req.json()
-    queue = asyncio.Queue()
+    stream = data.get('stream', 'nodes')
+    if stream not in STREAM_MODES:
+        raise HTTPException(status_code=400, detail=f"'stream' must be one of {list(STREAM_MODES)}")
+    request_budget(data)
+    queue_deadline(data)
+
+    client_limiter.check(client_id(req))
+
+    # Identical stateless requests share one run (single-flight)
+    coalesce_key = None
+    if coalescer.enabled and data.get('coalesce', True) and not data.get('thread_id'):
+        options = {
+            "fast_path": data.get('fast_path', True), "stream": stream,
+            "trace": bool(data.get('trace')), "budget": data.get('budget'),
+        }
+        coalesce_key = coalescer.key(data['message'], options)
+        shared = coalescer.join(coalesce_key)
+        if shared is not None:
+            return _coalesced_response(shared)
+
+    # Start the trace first, so the wait for a run slot is one of its spans;
+    # the run's task inherits it along with the rest of this context
+    trace = start_trace()
+    # Wait for a run slot before the response starts, so overload can still be a 429
+    await run_gate.acquire(queue_deadline(data))
+    started = time.monotonic()
+
+    if coalesce_key is not None:
+        # An identical request may have started while this one was queued
+        shared = coalescer.join(coalesce_key)
+        if shared is not None:
+            run_gate.release()
+            return _coalesced_response(shared)
+
+        log = event_log.start(format_sse) if SSE_RESUME_ENABLED else None
+        # With a log, events get ids and are kept for reconnects; the log decides about cancelling
+        shared = coalescer.start(
+            coalesce_key, log.record if log is not None else format_sse, SSE_QUEUE_SIZE, SSE_OVERFLOW_POLICY
+        )
+        shared.log = log
+        task = asyncio.create_task(orchestrate(data, stream, shared.send, trace))
+        if log is not None:
+            log.task = task
+        else:
+            shared.task = task
+
+        def on_shared_done(_):
+            run_gate.release(time.monotonic() - started)
+            final = {"usage": {}, "info": "stream_complete"}
+            shared.finish(log.finish("meta", final) if log is not None else format_sse("meta", final))
+
+        task.add_done_callback(on_shared_done)
+        return _coalesced_response(shared)
+
+    if SSE_RESUME_ENABLED:
+        log = event_log.start(format_sse, SSE_QUEUE_SIZE, SSE_OVERFLOW_POLICY)
+        log.task = asyncio.create_task(orchestrate(data, stream, log.send, trace))
+
+        def on_logged_done(_):
+            run_gate.release(time.monotonic() - started)
+            log.finish("meta", {"usage": {}, "info": "stream_complete"})
+
+        log.task.add_done_callback(on_logged_done)
+        return StreamingResponse(
+            count_bytes(log.follow(0, _HEARTBEAT, SSE_HEARTBEAT_INTERVAL), "/run_agent"),
+            media_type="text/event-stream",
+            headers={"X-Run-ID": log.run_id},
+        )
+
+    events = SSEStream()
+    events.task = asyncio.create_task(orchestrate(data, stream, events.send, trace))
+
+    def on_done(_):
+        # Runs even if the task is cancelled before it starts
+        run_gate.release(time.monotonic() - started)
+        events.close()
 
-    async def sse_send(event: str, payload: dict):
-        """Push an SSE event to the async queue."""
-        await queue.put((event, payload))
+    events.task.add_done_callback(on_done)
+    return StreamingResponse(
+        count_bytes(event_generator(events, req), "/run_agent"),
+        media_type="text/event-stream",
+    )
 
-    async def orchestrator_task():
+# ======================================================
+# 🔸 Batch Endpoint (NDJSON)
+# ======================================================
+# Default and upper bound for concurrent runs within one batch
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+
+async def batch_generator(prompts: List[str], concurrency: int, fast_path: bool, budget: Optional[dict] = None):
+    """Run prompts with bounded concurrency and yield one NDJSON line per finished item."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, prompt: str) -> dict:
+        async with semaphore:
+            try:
+                async with run_gate.slot():
+                    # Each item gets its own budget, started when the item starts
+                    response = await run_agent(prompt, fast_path=fast_path, budget=Budget.from_request(budget))
+                return {"index": index, "response": response, "error": None}
+            except Exception as e:
+                # Per-item errors are reported, never abort the batch
+                return {"index": index, "response": None, "error": str(e)}
+
+    tasks = [asyncio.create_task(run_one(i, prompt)) for i, prompt in enumerate(prompts)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield dumps(await finished) + "\n"
+    finally:
+        # Client went away: stop the remaining runs
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/run_agent_batch")
+async def run_agent_batch_api(req: Request):
+    """
+    Run many prompts in one request.
+
+    Body: {"messages": [...], "concurrency": 4, "fast_path": true, "budget": {...}}
+    Streams NDJSON lines {"index", "response", "error"} in completion order.
+    """
+    client_limiter.check(client_id(req))
+    data = await req.json()
+    prompts = data.get("messages")
+    if not isinstance(prompts, list) or not all(isinstance(p, str) for p in prompts):
+        raise HTTPException(status_code=400, detail="'messages' must be a list of strings")
+
+    concurrency = data.get("concurrency", BATCH_DEFAULT_CONCURRENCY)
+    if not isinstance(concurrency, int) or concurrency < 1:
+        raise HTTPException(status_code=400, detail="'concurrency' must be a positive integer")
+    concurrency = min(concurrency, BATCH_MAX_CONCURRENCY)
+    request_budget(data)
+
+    return StreamingResponse(
+        count_bytes(
+            batch_generator(prompts, concurrency, data.get("fast_path", True), data.get("budget")),
+            "/run_agent_batch",
+        ),
+        media_type="application/x-ndjson",
+    )
+
+@app.get("/runs/{run_id}/events")
+async def run_events_api(run_id: str, req: Request, last_event_id: Optional[str] = None):
+    """
+    Resume (or watch) a run's SSE stream. The events after `Last-Event-ID` (header, or
+    ?last_event_id=; "<run_id>:<seq>" or just "<seq>") are replayed, then the run is
+    followed live. Without one, the stream starts from the run's first event.
+    """
+    if not SSE_RESUME_ENABLED:
+        raise HTTPException(status_code=404, detail="Resumable streams are disabled")
+    value = req.headers.get("Last-Event-ID") or last_event_id
+    after = 0
+    if value:
         try:
-            # Run the LangGraph agent (it will emit thinking/tool/token/etc.)
-            await run_agent(data['message'], sse_send)
-        except Exception as e:
-            await sse_send("meta", {"error": str(e)})
-        finally:
-            await queue.put("[DONE]")
-
-    asyncio.create_task(orchestrator_task())
-    return StreamingResponse(event_generator(queue), media_type="text/event-stream")
+            event_run_id, after = parse_event_id(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="'Last-Event-ID' must be '<run_id>:<seq>' or '<seq>'")
+        if event_run_id not in (None, run_id):
+            raise HTTPException(status_code=400, detail="'Last-Event-ID' belongs to another run")
+    return await resume_response(run_id, after, "/runs/events")
+
+
+@app.get("/metrics")
+async def metrics_api():
+    """Prometheus metrics: node/tool/MCP latency, tokens, tool errors, queue wait, SSE bytes."""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/admission")
+async def admission_api():
+    """Current in-flight counts, queue depth and wait times of the admission gates."""
+    stats = {
+        **admission_stats(),
+        "coalescing": coalescer.stats(),
+        "tool_cache": tool_result_cache.stats(),
+        "llm_cache": llm_response_cache.stats(),
+    }
+    model = get_tool_registry().model
+    if hasattr(model, "deployments"):
+        # Per-deployment health of the LLM_DEPLOYMENTS pool
+        stats["llm_pool"] = model.stats()
+    return stats
 
 # ======================================================
 # 🔸 Entry Point
@@ -0,0 +1,119 @@
+"""
+Async Graph Benchmark
+---------------------
+Compares concurrent request throughput of a blocking graph path
+(the original sync nodes, reproduced below, driven through ``agent.stream``)
+against the async path
+(``allm_call``/``atool_node`` driven through ``agent.astream``), using a
+stubbed model that sleeps instead of calling Azure.
+
+Run with:
+    python benchmarks/bench_async_graph.py --requests 20 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The real model is never called, but get_tool_registry() still builds its client before SlowModel replaces it
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "bench")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://bench.invalid")
+os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT_NAME", "bench")
+os.environ.setdefault("MCP_TOOLS_ENABLED", "false")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.constants import START, END
+from langgraph.graph import StateGraph
+
+from agentic_components import nodes
+from agentic_components.state import MessagesState
+
+
+class SlowModel:
+    """Stub chat model: one tool call, then a final answer, each after `latency` seconds."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def _reply(self, messages):
+        if any(getattr(m, "type", "") == "tool" for m in messages):
+            return AIMessage(content="The result is 4.0")
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": "add", "args": {"a": 2, "b": 2}, "id": "call_1"}],
+        )
+
+    def invoke(self, messages, *args, **kwargs):
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+
+def blocking_llm_call(state: dict):
+    """The original sync llm_call: the model call blocks the event loop"""
+    response = nodes.get_tool_registry().model.invoke(state["messages"])
+    return {"messages": [response], "llm_calls": state.get("llm_calls", 0) + 1}
+
+
+def blocking_tool_node(state: dict):
+    """The original sync tool_node: tool calls run one after another"""
+    tools_by_name = nodes.get_tool_registry().tools_by_name
+    result = []
+    for tool_call in state["messages"][-1].tool_calls:
+        observation = tools_by_name[tool_call["name"]].invoke(tool_call["args"])
+        result.append(ToolMessage(content=str(observation), tool_call_id=tool_call["id"]))
+    return {"messages": result}
+
+
+def build_graph(llm_node, tool_node):
+    builder = StateGraph(MessagesState)
+    builder.add_node("llm_call", llm_node)
+    builder.add_node("tool_node", tool_node)
+    builder.add_edge(START, "llm_call")
+    builder.add_conditional_edges("llm_call", nodes.should_continue, ["tool_node", END])
+    builder.add_edge("tool_node", "llm_call")
+    return builder.compile()
+
+
+async def run_blocking(graph, prompt):
+    # Mirrors the previous run_agent: a sync iterator inside a coroutine
+    for _ in graph.stream({"messages": [HumanMessage(content=prompt)]}):
+        pass
+
+
+async def run_async(graph, prompt):
+    async for _ in graph.astream({"messages": [HumanMessage(content=prompt)]}):
+        pass
+
+
+async def measure(label, runner, graph, n):
+    start = time.perf_counter()
+    await asyncio.gather(*(runner(graph, f"add 2 and 2 #{i}") for i in range(n)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {n:>5} requests  {elapsed:8.3f}s  {n / elapsed:8.2f} req/s")
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency per call (s)")
+    args = parser.parse_args()
+
+    nodes.get_tool_registry().model = SlowModel(args.latency)
+
+    blocking = await measure("blocking", run_blocking, build_graph(blocking_llm_call, blocking_tool_node), args.requests)
+    non_blocking = await measure("async", run_async, build_graph(nodes.allm_call, nodes.atool_node), args.requests)
+    print(f"speedup    {blocking / non_blocking:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
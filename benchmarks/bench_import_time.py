@@ -0,0 +1,91 @@
+"""
+Import-Time Budget
+------------------
+Imports each entry module in a fresh interpreter and checks that cold import
+stays under a time budget, that no heavy optional stack (provider SDKs,
+numpy) is pulled in, and that the model and graph are not built at import
+time. Exits non-zero on any violation, so it can run as a CI gate.
+
+Run with:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget api=1.5 --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Default budgets (seconds, median cold import) per module
+BUDGETS = {
+    "api": 2.0,
+    "server": 2.0,
+    "agentic_components.graph": 1.5,
+}
+
+# Modules that must only be imported on first use
+LAZY_MODULES = ("langchain_openai", "openai", "numpy")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+llm = sys.modules.get("agentic_components.llm")
+graph = sys.modules.get("agentic_components.graph")
+print(json.dumps({{
+    "elapsed": elapsed,
+    "loaded": [m for m in {lazy!r} if m in sys.modules],
+    "model_built": getattr(llm, "_tool_registry", None) is not None,
+    "graph_built": getattr(graph, "_agent", None) is not None,
+}}))
+"""
+
+
+def probe(module: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    # Modules may print while importing; the probe's JSON is the last line
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per module (median is checked)")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=SECONDS",
+                        help="override or add a budget")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for item in args.budget:
+        module, seconds = item.split("=", 1)
+        budgets[module] = float(seconds)
+
+    failures = []
+    for module, budget in budgets.items():
+        results = [probe(module) for _ in range(args.runs)]
+        median = statistics.median(r["elapsed"] for r in results)
+        last = results[-1]
+        ok = median <= budget and not last["loaded"] and not last["model_built"] and not last["graph_built"]
+        print(f"{module:<28} {median * 1000:8.1f} ms  (budget {budget * 1000:.0f} ms)  {'ok' if ok else 'FAIL'}")
+        if median > budget:
+            failures.append(f"{module}: {median:.3f}s over budget {budget:.3f}s")
+        if last["loaded"]:
+            failures.append(f"{module}: imports {', '.join(last['loaded'])} eagerly")
+        if last["model_built"] or last["graph_built"]:
+            failures.append(f"{module}: builds the model/graph at import time")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
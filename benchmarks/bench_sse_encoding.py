@@ -0,0 +1,108 @@
+"""
+SSE Encoding Benchmark
+----------------------
+Measures encode time and bytes on the wire for the agent_event stream of
+a long, tool-heavy conversation. Compares the previous encoder
+(recursive ``__dict__`` walk + ``json.dumps``) with the typed encoders in
+``agentic_components.sse`` using the stdlib and orjson backends.
+
+Run with:
+    python benchmarks/bench_sse_encoding.py --turns 200 --tools-per-turn 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agentic_components import sse
+
+
+def legacy_serialize_obj(obj):
+    """The api.py encoder before typed encoders, kept here as the baseline"""
+    if hasattr(obj, '__dict__'):
+        return {k: legacy_serialize_obj(v) for k, v in obj.__dict__.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [legacy_serialize_obj(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {k: legacy_serialize_obj(v) for k, v in obj.items()}
+    elif hasattr(obj, '__str__'):
+        try:
+            return str(obj)
+        except:
+            return repr(obj)
+    return obj
+
+
+def legacy_format_sse(event, data):
+    data = json.dumps(legacy_serialize_obj(data), ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def build_events(turns: int, tools_per_turn: int, history_in_events: bool):
+    """agent_event payloads of a conversation; optionally each carries the full history"""
+    metadata = {
+        "token_usage": {"completion_tokens": 42, "prompt_tokens": 900, "total_tokens": 942},
+        "model_name": "gpt-4o-mini-2024-07-18",
+        "system_fingerprint": "fp_bench",
+        "finish_reason": "tool_calls",
+        "content_filter_results": {"hate": {"filtered": False, "severity": "safe"}},
+    }
+    history = [HumanMessage(content="Please run a long series of calculations.", id="h0")]
+    events = []
+    for turn in range(turns):
+        calls = [
+            {"name": "multiply", "args": {"a": turn, "b": i}, "id": f"call_{turn}_{i}", "type": "tool_call"}
+            for i in range(tools_per_turn)
+        ]
+        ai = AIMessage(content="", tool_calls=calls, id=f"ai_{turn}", response_metadata=metadata,
+                       usage_metadata={"input_tokens": 900, "output_tokens": 42, "total_tokens": 942})
+        history.append(ai)
+        events.append({"llm_call": {"messages": list(history) if history_in_events else [ai], "llm_calls": turn + 1}})
+
+        results = [ToolMessage(content=str(float(turn * i)), tool_call_id=c["id"], id=f"tool_{turn}_{i}")
+                   for i, c in enumerate(calls)]
+        history.extend(results)
+        events.append({"tool_node": {"messages": list(history) if history_in_events else results}})
+    return events
+
+
+def measure(label, encode, events):
+    # Exclude one-off costs (lazy imports, dispatch caches) from the timing
+    legacy_format_sse("warmup", events[0])
+    sse.format_sse("warmup", events[0])
+    start = time.perf_counter()
+    total_bytes = sum(len(encode(event).encode("utf-8")) for event in events)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed * 1e6 / len(events):10.1f} us/event {total_bytes / 1024:12.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--tools-per-turn", type=int, default=4)
+    parser.add_argument("--history-in-events", action="store_true",
+                        help="each event carries the whole transcript (worst case)")
+    args = parser.parse_args()
+
+    events = build_events(args.turns, args.tools_per_turn, args.history_in_events)
+    print(f"{len(events)} agent_events, orjson {'available' if sse.orjson else 'not installed'}")
+
+    measure("legacy", lambda e: legacy_format_sse("agent_event", e), events)
+
+    backend = sse.dumps
+    sse.dumps = sse._json_dumps
+    measure("typed/json", lambda e: sse.format_sse("agent_event", e), events)
+    sse.dumps = backend
+
+    if sse.orjson is not None:
+        measure("typed/orjson", lambda e: sse.format_sse("agent_event", e), events)
+
+
+if __name__ == "__main__":
+    main()
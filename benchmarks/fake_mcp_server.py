@@ -0,0 +1,35 @@
+"""
+Fake MCP Server
+---------------
+Local MCP server for load tests: serves only the math tools (no network or
+credentials needed) on the same /mcp routes as server.py.
+
+Run with:
+    python benchmarks/fake_mcp_server.py --port 8090
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+
+from server import MCP_PATH, create_mcp_server
+
+
+def create_app():
+    return create_mcp_server(["math_tools"]).http_app(path=MCP_PATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
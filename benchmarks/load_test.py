@@ -0,0 +1,237 @@
+"""
+End-to-End Load Test
+--------------------
+Starts the fake MCP server and the API (with LLM_PROVIDER=fake) as
+subprocesses, then drives /run_agent with concurrent SSE clients and reports
+latency percentiles, time to first byte, throughput, errors and API memory.
+
+Every request goes through the real path: admission, graph, tool node, MCP
+HTTP client and SSE encoding. Caches and request coalescing are disabled by
+default (each prompt is unique anyway) so results measure the uncached path;
+pass --with-caches to leave them on.
+
+Run with:
+    python benchmarks/load_test.py --requests 200 --concurrency 20
+    python benchmarks/load_test.py --llm-latency 0.2 --stream tokens --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def rss_mb(pid):
+    """Resident set size of a process in MB (Linux only; None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def spawn(args, env, cwd=ROOT):
+    return subprocess.Popen(
+        [sys.executable, *args], cwd=cwd, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+
+
+async def wait_ready(url, proc, timeout=60.0, method="GET"):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{url} exited early:\n{proc.stderr.read().decode()}")
+            try:
+                await client.request(method, url, timeout=1.0)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def server_env(args):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT,
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "FAKE_LLM_TOKEN_LATENCY": str(args.token_latency),
+        "FAKE_LLM_JITTER": str(args.jitter),
+        "MCP_SERVER_URL": f"http://127.0.0.1:{args.mcp_port}/mcp",
+        # Let the load test find the limits instead of the default gates
+        "MAX_CONCURRENT_RUNS": str(max(args.concurrency, 32)),
+        "MAX_QUEUED_RUNS": str(args.requests),
+        "MAX_CONCURRENT_LLM_CALLS": str(max(args.concurrency, 16)),
+    })
+    if not args.with_caches:
+        env.update({
+            "LLM_CACHE_ENABLED": "false",
+            "TOOL_CACHE_SIZE": "0",
+            "COALESCE_ENABLED": "false",
+        })
+    return env
+
+
+async def one_request(client, url, i, args, results):
+    body = {
+        "message": f"Please compute {i} * 7 + {i % 13}",
+        "fast_path": False,
+        "stream": args.stream,
+    }
+    start = time.perf_counter()
+    ttfb = None
+    nbytes = 0
+    try:
+        async with client.stream("POST", url, json=body) as response:
+            if response.status_code != 200:
+                await response.aread()
+                results["errors"].append(f"HTTP {response.status_code}")
+                return
+            async for chunk in response.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                nbytes += len(chunk)
+    except httpx.HTTPError as e:
+        results["errors"].append(type(e).__name__)
+        return
+    results["latency"].append(time.perf_counter() - start)
+    results["ttfb"].append(ttfb or 0.0)
+    results["bytes"] += nbytes
+
+
+async def drive(args, api_pid):
+    url = f"http://127.0.0.1:{args.api_port}/run_agent"
+    results = {"latency": [], "ttfb": [], "errors": [], "bytes": 0}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    sem = asyncio.Semaphore(args.concurrency)
+    peak_rss = [rss_mb(api_pid) or 0.0]
+
+    async def sample_rss():
+        while True:
+            peak_rss[0] = max(peak_rss[0], rss_mb(api_pid) or 0.0)
+            await asyncio.sleep(0.1)
+
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        # Warm-up: imports, first MCP connection, tool discovery
+        for i in range(min(args.warmup, args.requests)):
+            await one_request(client, url, -1 - i, args, {"latency": [], "ttfb": [], "errors": [], "bytes": 0})
+        idle_rss = rss_mb(api_pid)
+
+        async def bounded(i):
+            async with sem:
+                await one_request(client, url, i, args, results)
+
+        sampler = asyncio.create_task(sample_rss())
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        sampler.cancel()
+
+    ok = len(results["latency"])
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "stream": args.stream,
+        "llm_latency": args.llm_latency,
+        "ok": ok,
+        "errors": len(results["errors"]),
+        "error_kinds": sorted(set(results["errors"])),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {p: round(percentile(results["latency"], n) * 1000, 1)
+                       for p, n in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "ttfb_ms": {p: round(percentile(results["ttfb"], n) * 1000, 1)
+                    for p, n in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "bytes_per_stream": round(results["bytes"] / ok) if ok else 0,
+    }
+    if idle_rss is not None:
+        report["rss_idle_mb"] = round(idle_rss, 1)
+        report["rss_peak_mb"] = round(peak_rss[0], 1)
+        report["rss_per_stream_kb"] = round((peak_rss[0] - idle_rss) * 1024 / args.concurrency, 1)
+    return report
+
+
+def print_report(report):
+    print(f"\nrequests={report['requests']} concurrency={report['concurrency']} "
+          f"stream={report['stream']} llm_latency={report['llm_latency']}s")
+    print(f"  ok={report['ok']} errors={report['errors']} {report['error_kinds'] or ''}")
+    print(f"  throughput   {report['rps']:>8.2f} req/s over {report['elapsed_s']}s")
+    for name in ("latency_ms", "ttfb_ms"):
+        v = report[name]
+        print(f"  {name:<12} p50={v['p50']:>8.1f}  p95={v['p95']:>8.1f}  p99={v['p99']:>8.1f}")
+    print(f"  bytes/stream {report['bytes_per_stream']:>8}")
+    if "rss_idle_mb" in report:
+        print(f"  api rss      idle={report['rss_idle_mb']} MB  peak={report['rss_peak_mb']} MB  "
+              f"~{report['rss_per_stream_kb']} KB/stream")
+
+
+def stop(proc):
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--stream", choices=["nodes", "tokens", "both"], default="nodes")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake model latency per call (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake model delay per streamed token (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="fractional jitter on --llm-latency")
+    parser.add_argument("--with-caches", action="store_true", help="keep LLM/tool caches and coalescing on")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--api-port", type=int, default=8101)
+    parser.add_argument("--mcp-port", type=int, default=8090)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    env = server_env(args)
+    mcp = spawn(["benchmarks/fake_mcp_server.py", "--port", str(args.mcp_port)], env)
+    api = None
+    try:
+        await wait_ready(f"http://127.0.0.1:{args.mcp_port}/metrics", mcp)
+        api = spawn(["-m", "uvicorn", "api:app", "--host", "127.0.0.1",
+                     "--port", str(args.api_port), "--log-level", "warning"], env)
+        await wait_ready(f"http://127.0.0.1:{args.api_port}/admission", api)
+        report = await drive(args, api.pid)
+    finally:
+        if api is not None:
+            stop(api)
+        stop(mcp)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
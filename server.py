@@ -20,16 +20,137 @@ if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+import hashlib
 import importlib
+import json
+import time
 import uvicorn
 from fastmcp import FastMCP
+from fastmcp.exceptions import NotFoundError
+from fastmcp.server.middleware import Middleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response
 
+from agentic_components.metrics import CONTENT_TYPE, registry
 
-def create_mcp_server() -> FastMCP:
+# Mount path of the MCP endpoint; the REST routes below live under it too
+MCP_PATH = "/mcp"
+# Comma-separated tool modules to register (agentic_components/tools/<name>.py)
+DEFAULT_TOOL_MODULES = [
+    name.strip() for name in os.getenv("MCP_TOOL_MODULES", "math_tools,generic_tools").split(",") if name.strip()
+]
+
+server_tool_latency = registry.histogram(
+    "mcp_server_tool_latency_seconds", "Latency of tool calls handled by this MCP server", ("tool",)
+)
+server_tool_calls = registry.counter(
+    "mcp_server_tool_calls_total", "Tool calls handled by this MCP server by outcome", ("tool", "status")
+)
+
+
+class MetricsMiddleware(Middleware):
+    """Record latency and outcome of every tool call."""
+
+    async def on_call_tool(self, context, call_next):
+        tool_name = context.message.name
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            return await call_next(context)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            server_tool_latency.observe(time.perf_counter() - start, tool=tool_name)
+            server_tool_calls.inc(tool=tool_name, status=status)
+
+
+# Most calls accepted by one /tools/call_batch request
+MCP_BATCH_MAX_CALLS = int(os.getenv("MCP_BATCH_MAX_CALLS", "64"))
+
+
+def _request_timeout(request) -> float | None:
+    """Seconds left of the caller's deadline (X-Deadline-Ms header), if it sent one"""
+    try:
+        return max(0.0, int(request.headers["x-deadline-ms"]) / 1000)
+    except (KeyError, ValueError):
+        return None
+
+
+async def _call_tool(mcp: FastMCP, name: str, arguments: dict, timeout: float | None = None) -> tuple[int, dict]:
+    """Run one tool call; returns (HTTP status, JSON body) in the /tools/call format"""
+    try:
+        result = await asyncio.wait_for(mcp.call_tool(name, arguments or {}), timeout=timeout)
+    except asyncio.TimeoutError:
+        return 504, {"error": f"Tool '{name}' exceeded the caller's deadline", "isError": True}
+    except NotFoundError as e:
+        return 404, {"error": str(e), "isError": True}
+    except Exception as e:
+        return 500, {"error": str(e), "isError": True}
+    return 200, {
+        "content": [c.model_dump(mode="json", exclude_none=True) for c in result.content],
+        "structuredContent": result.structured_content,
+        "isError": False,
+    }
+
+
+def register_rest_routes(mcp: FastMCP, path: str = MCP_PATH):
+    """
+    Plain JSON routes used by agentic_components/mcp_tools.py:
+        POST {path}/tools/list        -> {"tools": [...]}  (ETag / If-None-Match aware)
+        POST {path}/tools/call        {"name", "arguments"} -> {"content", "structuredContent", "isError"}
+        POST {path}/tools/call_batch  {"calls": [{"name", "arguments"}, ...]}
+                                      -> {"results": [...]}, one /tools/call body per call, in order;
+                                         failed calls carry {"error", "isError": true}
+    An X-Deadline-Ms header bounds how long calls may run (504 / per-item error past it).
+    """
+
+    @mcp.custom_route(f"{path}/tools/list", methods=["POST"])
+    async def rest_list_tools(request):
+        tools = [
+            tool.to_mcp_tool().model_dump(by_alias=True, exclude_none=True, mode="json")
+            for tool in await mcp.list_tools()
+        ]
+        body = json.dumps({"tools": tools}, sort_keys=True)
+        etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type="application/json", headers={"ETag": etag})
+
+    @mcp.custom_route(f"{path}/tools/call", methods=["POST"])
+    async def rest_call_tool(request):
+        data = await request.json()
+        status, body = await _call_tool(mcp, data["name"], data.get("arguments"), _request_timeout(request))
+        if status != 200:
+            body = {"error": body["error"]}
+        return JSONResponse(body, status_code=status)
+
+    @mcp.custom_route(f"{path}/tools/call_batch", methods=["POST"])
+    async def rest_call_tool_batch(request):
+        data = await request.json()
+        calls = data.get("calls")
+        if not isinstance(calls, list) or not all(isinstance(c, dict) and "name" in c for c in calls):
+            return JSONResponse({"error": "'calls' must be a list of {name, arguments}"}, status_code=400)
+        if len(calls) > MCP_BATCH_MAX_CALLS:
+            return JSONResponse({"error": f"At most {MCP_BATCH_MAX_CALLS} calls per batch"}, status_code=413)
+
+        # Calls run concurrently; gather keeps the request order
+        timeout = _request_timeout(request)
+        results = await asyncio.gather(*(_call_tool(mcp, c["name"], c.get("arguments"), timeout) for c in calls))
+        return JSONResponse({"results": [body for _, body in results]})
+
+
+def create_mcp_server(tool_modules: list[str] | None = None) -> FastMCP:
     """Create a single MCP server and load all tool modules."""
     mcp = FastMCP("IntegratedTools")
+    mcp.add_middleware(MetricsMiddleware())
+    register_rest_routes(mcp)
+
+    @mcp.custom_route("/metrics", methods=["GET"])
+    async def metrics(request):
+        """Prometheus metrics for this server's tool calls."""
+        return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
 
-    tool_modules = ["math_tools", "generic_tools"]
+    tool_modules = tool_modules or DEFAULT_TOOL_MODULES
 
     for module_name in tool_modules:
         module_path = f"agentic_components.tools.{module_name}"
@@ -50,8 +171,8 @@ def create_mcp_server() -> FastMCP:
 
 
 if __name__ == "__main__":
-    port = 8080
-    path = "/mcp"
+    port = int(os.getenv("MCP_PORT", "8080"))
+    path = MCP_PATH
 
     mcp = create_mcp_server()
     app = mcp.http_app(path=path)